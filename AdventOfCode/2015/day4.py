@@ -7,6 +7,20 @@ five zeroes. The input to the MD5 hash is some secret key (your puzzle input, gi
 below) followed by a number in decimal. To mine AdventCoins, you must find Santa the
 lowest positive number (no leading zeroes: 1, 2, 3, ...) that produces such a hash.
 
+CHECKPOINTS (--checkpoint FILE): the highest nonce below which everything has been
+searched is saved to FILE periodically (and on interrupt), so a pre-empted search
+resumes there instead of at 1. Progress (H/s, elapsed, ETA) is reported to stderr.
+
+SWEEP MODE (--sweep): reports the lowest nonce for every difficulty 1..N in a single
+pass. No nonce below the lowest difficulty-d hit can have d+1 zeros either, so the
+difficulty d+1 search simply resumes there: the whole sweep costs about as much as
+difficulty N alone.
+
+PARALLEL MODE (--jobs): the nonce space is cut into contiguous ranges which are
+handed to a process pool in order. When a worker finds a hit, every worker on a
+range entirely above it gives up, but ranges below it are searched to the end,
+so the result is still the lowest qualifying nonce.
+
 TODO: MD5 has been "cracked" -- this means that we can intentionally generate
 digest collisions (same value for different input). It would be worth exploring
 if this is a quicker way to "crack" this problem.
@@ -15,43 +29,293 @@ if this is a quicker way to "crack" this problem.
 
 import argparse
 import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+DIFFICULTY = 6  # default number of leading zero nibbles (hex digits) required
+RANGE_SIZE = 50000  # nonces per worker task in parallel mode
+BATCH_SIZE = 1000  # nonces sharing all but their last 3 decimal digits, see search_range
+NO_HIT = 2**63 - 1  # "best" value until a hit is found
+REPORT_EVERY = 10  # seconds between progress reports
+CHECKPOINT_EVERY = 60  # seconds between checkpoint saves
+
+# Last 3 digits of a nonce, as bytes: zero padded behind a higher part ("007"), or
+# the whole nonce below BATCH_SIZE ("7")
+LOW_SUFFIXES = tuple(str(lo).zfill(3).encode() for lo in range(0, BATCH_SIZE))
+SMALL_SUFFIXES = tuple(str(lo).encode() for lo in range(0, BATCH_SIZE))
+
+# Lowest hit found so far, shared with the pool workers (set by init_worker).
+# None in serial mode
+best_nonce = None
+
+
+class SearchProgress:
+    """ Tracks the highest fully searched nonce ("searched_below": no hit below it),
+    reports hash rate/elapsed/ETA and saves/loads checkpoints. Uses a monotonic clock.
+    """
+    def __init__(self, secret_key, difficulty, checkpoint_path=None,
+                 report_every=REPORT_EVERY, checkpoint_every=CHECKPOINT_EVERY, start=1):
+        self.secret_key = secret_key.decode('utf-8')
+        self.difficulty = difficulty
+        self.checkpoint_path = checkpoint_path
+        self.report_every = report_every
+        self.checkpoint_every = checkpoint_every
+
+        self.searched_below = start  # 1 (no leading zeros) unless already searched below start
+        self.lowest = None  # result, once found
+        self.load()
+
+        self.resumed_at = self.searched_below
+        self.start_time = self.last_report = self.last_checkpoint = time.monotonic()
+
+    def load (self):
+        """ Resume from the checkpoint file, if it is for the same key. A search with no hit
+        below N at some difficulty has no hit below N at any higher difficulty either
+        """
+        if not self.checkpoint_path or not os.path.isfile(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, 'r') as f:
+            checkpoint = json.load(f)
+        if checkpoint['secret_key'] != self.secret_key or checkpoint['difficulty'] > self.difficulty:
+            return
+
+        self.searched_below = checkpoint['searched_below']
+        if checkpoint['difficulty'] == self.difficulty:
+            self.lowest = checkpoint.get('lowest')
+        print(f"resuming from checkpoint {self.checkpoint_path}: searched below {self.searched_below:,}",
+              file=sys.stderr)
+
+    def save (self):
+        """ Write the checkpoint atomically (temp file + rename)"""
+        if not self.checkpoint_path:
+            return
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'secret_key': self.secret_key,
+                'difficulty': self.difficulty,
+                'searched_below': self.searched_below,
+                'lowest': self.lowest,
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+        self.last_checkpoint = time.monotonic()
+
+    def searched (self, searched_below):
+        """ Everything below searched_below has been searched. Report/save when due"""
+        self.searched_below = max(self.searched_below, searched_below)
+        now = time.monotonic()
+        if self.report_every and now - self.last_report >= self.report_every:
+            self.report()
+        if now - self.last_checkpoint >= self.checkpoint_every:
+            self.save()
+
+    def found (self, nonce):
+        self.lowest = nonce
+        self.searched_below = nonce
+        self.save()
+
+    def report (self):
+        """ Print hash rate, elapsed time and ETA (to the expected 16**difficulty attempts)"""
+        now = time.monotonic()
+        self.last_report = now
+        elapsed = now - self.start_time
+        rate = (self.searched_below - self.resumed_at) / elapsed if elapsed else 0.0
+
+        expected = 16 ** self.difficulty
+        remaining = max(expected - self.searched_below, 0)
+        eta = format_seconds(remaining / rate) if rate else '?'
+        print(f"searched below {self.searched_below:,} | {rate:,.0f} H/s | elapsed {format_seconds(elapsed)} | "
+              f"ETA {eta} (expected ~{expected:,} attempts)", file=sys.stderr, flush=True)
+
+
+def format_seconds (seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}"
+
+
+def init_worker (shared_best):
+    global best_nonce
+    best_nonce = shared_best
+
+
+def digest_limit (difficulty):
+    """ A digest has >= difficulty leading zero nibbles iff, as raw bytes, it sorts
+    below this 16-byte value. One bytes compare, no hex conversion
+    """
+    return (1 << (128 - 4 * difficulty)).to_bytes(17, 'big')[1:] if difficulty else b'\xff' * 17
 
-def main (secret_key):
-    i = 1  # init prefix value (no leading zeros)
-    secret_key = bytes(secret_key, 'utf-8')
 
-    # start = time.time()  # only for timing
+def search_range (secret_key, start, stop, difficulty=DIFFICULTY):
+    """ Lowest nonce in [start, stop) whose digest has difficulty leading zero nibbles, or None.
 
+    The secret key is hashed once; each batch of BATCH_SIZE nonces shares its decimal
+    prefix (all but the last 3 digits), which is hashed once on top of the key. Each
+    nonce then only copies that state and adds its last 3 digits (no str() per nonce).
+    Between batches, gives up if another worker has found a hit below this batch.
+    """
+    key_md5 = hashlib.md5(secret_key)
+    limit = digest_limit(difficulty)
 
+    for batch_start in range(start - start % BATCH_SIZE, stop, BATCH_SIZE):
+        if best_nonce is not None and best_nonce.value < batch_start:
+            return None  # a lower hit exists, nothing here can beat it
+
+        high = batch_start // BATCH_SIZE
+        if high:
+            head_md5 = key_md5.copy()
+            head_md5.update(str(high).encode())
+            suffixes = LOW_SUFFIXES
+        else:
+            head_md5 = key_md5  # nonces < BATCH_SIZE: no leading zeros
+            suffixes = SMALL_SUFFIXES
+
+        lo_start = max(start - batch_start, 0)
+        lo_stop = min(stop - batch_start, BATCH_SIZE)
+        copy = head_md5.copy
+        for lo in range(lo_start, lo_stop):
+            md5 = copy()
+            md5.update(suffixes[lo])
+            if md5.digest() < limit:
+                return batch_start + lo
+    return None
+
+
+def serial_search (secret_key, difficulty=DIFFICULTY, range_size=RANGE_SIZE, start=1, progress=None):
+    """ Search range after range on this core, returns the lowest qualifying nonce >= start"""
     while True:
-        md5 = hashlib.md5()
-        md5.update(secret_key + str(i).encode())  # converts to bytes
-        digest = md5.hexdigest()
-        if digest[0:6] == '000000':
-            print(digest)
-            print(i)
-
-            # only for timing (NOTE: TIMING VALUES ARE FISHY)
-            #print(time.time() - start)
-            # PREFIX  | i        | time (sec)
-            # '0'     | 4        | 9.083747863769531e-05
-            # '00'    | 524      | 0.002682209014892578
-            # '000'   | 1866     | 0.011358976364135742
-            # '0000'  | 43159    | 2.1244561672210693
-            # '00000' | 454532   | 7 min < t < 10 min
-            # 5*4 = 20 leading zeros...
-
-            # attempts = 0.5874 * e ** 2.7693 * bit_num
-            # R^2 = 0.96895
-            # NOTE: time does not map linearly with attempts vs time
-            # Longer hashes = harder.
-
-            break
-        i += 1
+        hit = search_range(secret_key, start, start + range_size, difficulty)
+        if hit is not None:
+            return hit
+        start += range_size
+        if progress:
+            progress.searched(start)
+
+
+def parallel_search (secret_key, jobs, difficulty=DIFFICULTY, range_size=RANGE_SIZE, start=1, progress=None):
+    """ Search with a pool of jobs processes, returns the lowest qualifying nonce >= start.
+    Ranges are submitted in order and a hit only becomes final once every range
+    below it has finished.
+    """
+    shared_best = multiprocessing.Value('q', NO_HIT)
+    pending = {}  # future: range start
+    next_start = start
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(shared_best,)) as executor:
+        while True:
+            # keep every worker busy, but never hand out ranges above a known hit
+            while len(pending) < 2 * jobs and next_start < shared_best.value:
+                future = executor.submit(search_range, secret_key, next_start, next_start + range_size, difficulty)
+                pending[future] = next_start
+                next_start += range_size
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                hit = future.result()
+                if hit is not None and hit < shared_best.value:
+                    shared_best.value = hit  # workers above it stop at their next check
+
+            if progress:
+                # fully searched up to the lowest range still running
+                progress.searched(min(min(pending.values(), default=next_start), shared_best.value))
+
+            # final once nothing below the best hit is still being searched
+            if shared_best.value != NO_HIT and all(start > shared_best.value for start in pending.values()):
+                for future in pending:
+                    future.cancel()
+                return shared_best.value
+
+
+def sweep (secret_key, max_difficulty=DIFFICULTY, jobs=1, report_every=REPORT_EVERY):
+    """ Lowest nonce for each difficulty 1..max_difficulty, in one pass over the nonces.
+    Returns a list of (difficulty, nonce, seconds since the sweep started)
+    """
+    results = []
+    start = 1
+    start_time = time.monotonic()
+    for difficulty in range(1, max_difficulty + 1):
+        # nonces below start were searched at the lower difficulties, not counted here
+        progress = SearchProgress(secret_key, difficulty, report_every=report_every, start=start)
+        if jobs > 1:
+            start = parallel_search(secret_key, jobs, difficulty, start=start, progress=progress)
+        else:
+            start = serial_search(secret_key, difficulty, start=start, progress=progress)
+        results.append((difficulty, start, time.monotonic() - start_time))
+    return results
+
+
+def print_sweep (results):
+    """ Same layout as the hand-kept table in main"""
+    prefix_width = max(len('PREFIX'), len(repr('0' * results[-1][0])))
+    nonce_width = max(len('i'), len(str(results[-1][1])))
+    print(f"{'PREFIX':<{prefix_width}} | {'i':<{nonce_width}} | time (sec)")
+    for difficulty, nonce, seconds in results:
+        print(f"{repr('0' * difficulty):<{prefix_width}} | {nonce:<{nonce_width}} | {seconds:.6f}")
+
+
+def main (secret_key, difficulty=DIFFICULTY, jobs=1, checkpoint_path=None, report_every=REPORT_EVERY):
+    secret_key = bytes(secret_key, 'utf-8')
+    progress = SearchProgress(secret_key, difficulty, checkpoint_path, report_every)
+
+    # pre-emption usually arrives as SIGTERM: unwind like Ctrl-C so the checkpoint is saved
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    i = progress.lowest
+    if i is None:
+        try:
+            if jobs > 1:
+                i = parallel_search(secret_key, jobs, difficulty, start=progress.searched_below, progress=progress)
+            else:
+                i = serial_search(secret_key, difficulty, start=progress.searched_below, progress=progress)
+        except KeyboardInterrupt:
+            progress.save()
+            print(f"interrupted, searched below {progress.searched_below:,}", file=sys.stderr)
+            sys.exit(1)
+        progress.found(i)
+        if report_every:
+            progress.report()
+
+    print(hashlib.md5(secret_key + str(i).encode()).hexdigest())
+    print(i)
+
+    # only for timing (NOTE: TIMING VALUES ARE FISHY, re-measure with --sweep)
+    # PREFIX  | i        | time (sec)
+    # '0'     | 4        | 9.083747863769531e-05
+    # '00'    | 524      | 0.002682209014892578
+    # '000'   | 1866     | 0.011358976364135742
+    # '0000'  | 43159    | 2.1244561672210693
+    # '00000' | 454532   | 7 min < t < 10 min
+    # 5*4 = 20 leading zeros...
+
+    # attempts = 0.5874 * e ** 2.7693 * bit_num
+    # R^2 = 0.96895
+    # NOTE: time does not map linearly with attempts vs time
+    # Longer hashes = harder.
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('secret_key', type=str, help="Secret Key (see challenge descr.)")
+    parser.add_argument('-d', '--difficulty', type=int, default=DIFFICULTY,
+                        help=f"leading zeros (hex digits) required in the digest (default: {DIFFICULTY})")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="worker processes, 0 for one per core (default: 1, serial)")
+    parser.add_argument('-c', '--checkpoint', type=str, default=None,
+                        help="checkpoint file: resume from it, and save progress to it periodically")
+    parser.add_argument('--report-every', type=float, default=REPORT_EVERY,
+                        help=f"seconds between H/s / ETA reports on stderr, 0 to disable (default: {REPORT_EVERY})")
+    parser.add_argument('--sweep', action='store_true',
+                        help="report the lowest nonce for every difficulty 1..DIFFICULTY, in one pass")
     args = parser.parse_args()
-    main(args.secret_key)
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.sweep:
+        print_sweep(sweep(bytes(args.secret_key, 'utf-8'), args.difficulty, jobs, args.report_every))
+        sys.exit(0)
+    main(args.secret_key, difficulty=args.difficulty, jobs=jobs,
+         checkpoint_path=args.checkpoint, report_every=args.report_every)
@@ -28,61 +28,462 @@
 # This is reminiscent of "On Off" coding used on old TV broadcasts.
 # Rather than code every pixel, write "start/stop" instructions.
 #
-# THIS is very slow and could be improved dramatically.
+# Each instruction is a single in-place numpy slice operation on the grid (was a
+# python lambda call per light, i.e. 10^6 calls for a full-grid instruction).
+#
+# ENGINES (--engine):
+#   dense:  one float per light, simplest
+#   packed: one bit per light in uint64 words, on/off/toggle are word masks over a
+#           span of rows, counting is a popcount. 10^5 x 10^5 lights is 1.25 GB.
+#   compressed: no grid at all. The distinct rectangle edges cut the grid into cells
+#           whose lights always share a state; counts are weighted by cell area.
+#           Cost depends on the number of instructions only (fine for 10^9 x 10^9).
+#   reverse: runs the instructions last to first. A light hit by a later on/off is
+#           decided, nothing earlier can change it; toggles on undecided lights are
+#           kept as a parity. Tiles with nothing undecided left are skipped, so
+#           heavily overlapping instructions cost little.
+#
+# BRIGHTNESS MODE (--brightness, part 2): on +1, off -1 (not below 0), toggle +2.
+# Between two "turn off"s everything is additive, so such a run is summed into a 2D
+# difference array (O(1) per rectangle) and added with one prefix-sum pass; only the
+# "turn off"s, where the floor at 0 matters, are applied as dense slices.
+#
+# Instruction files are parsed in bulk (parse_instructions) into a structured array
+# of (op, x0, y0, x1, y1) rows, which all engines consume.
 
 # IMPORTS
+import argparse
 import numpy as np
 import re
 from sys import exit
 
+# PARSING
+OPS = ('turn on', 'turn off', 'toggle')  # op code -> command
+INSTRUCTION_DTYPE = np.dtype([('op', np.uint8), ('x0', np.int64), ('y0', np.int64),
+                              ('x1', np.int64), ('y1', np.int64)])
+
+BRIGHTNESS_STEP = np.array([1, -1, 2], dtype=np.int64)  # per op code, see OPS
+
+PARSE_BLOCK_SIZE = 2**24  # bytes per read when parsing from a file object
+
+# every byte but the digits -> space
+DIGITS_ONLY = bytes(c if ord('0') <= c <= ord('9') else ord(' ') for c in range(256))
+
+
+def parse_instructions (data, block_size=PARSE_BLOCK_SIZE):
+    """ Parse a whole instruction file (str, bytes or an open file / stream with read())
+    into an INSTRUCTION_DTYPE array. Streams are read in line-aligned blocks of about
+    block_size bytes, so multi-million-line files are never held as text all at once.
+    """
+    if hasattr(data, 'read'):
+        blocks = [parse_block(block) for block in read_line_blocks(data, block_size)]
+        return np.concatenate(blocks) if blocks else np.empty(0, dtype=INSTRUCTION_DTYPE)
+    return parse_block(data)
+
+
+def read_line_blocks (stream, block_size=PARSE_BLOCK_SIZE):
+    """ Blocks of whole lines (bytes) from a text or binary stream"""
+    rest = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        if isinstance(block, str):
+            block = block.encode()
+        block = rest + block
+        end = block.rfind(b'\n') + 1  # a line cut by the read waits for the next block
+        rest = block[end:]
+        if end:
+            yield block[:end]
+    if rest:
+        yield rest
+
+
+def parse_block (data):
+    """ Parse instruction text (str or bytes) into an INSTRUCTION_DTYPE array.
+
+    Commands are replaced by their op code, everything but digits by spaces, and
+    numpy reads all the numbers in one call: no per-line python work.
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    n_instructions = data.count(b'through')
+    numbers = data
+    for op, cmd in enumerate(OPS):
+        numbers = numbers.replace(cmd.encode(), str(op).encode())
+    values = np.fromstring(numbers.translate(DIGITS_ONLY), dtype=np.int64, sep=' ')
+
+    if len(values) != 5 * n_instructions or (values[::5] >= len(OPS)).any():
+        # malformed input: find and report the offending line
+        for line in data.decode().splitlines():
+            if line.strip():
+                LightDisplay.parse_instruction(line)
+        print("ERROR: could not parse instructions")
+        exit(-1)
+
+    values = values.reshape(-1, 5)
+    instructions = np.empty(len(values), dtype=INSTRUCTION_DTYPE)
+    for col, name in enumerate(INSTRUCTION_DTYPE.names):
+        instructions[name] = values[:, col]
+    return instructions
+
+
+def instruction_tuples (instructions):
+    """ (cmd, x_inds, y_inds) per row of an INSTRUCTION_DTYPE array, inclusive inds"""
+    for op, x0, y0, x1, y1 in instructions.tolist():
+        yield OPS[op], [x0, x1], [y0, y1]
+
+
+def check_rectangle (x_inds, y_inds, dims):
+    """ Raise ValueError unless 0 <= x0 <= x1 < dims[0] and the same for y"""
+    if not (0 <= x_inds[0] <= x_inds[1] < dims[0] and 0 <= y_inds[0] <= y_inds[1] < dims[1]):
+        raise ValueError(f"rectangle {x_inds[0]},{y_inds[0]} through {x_inds[1]},{y_inds[1]} "
+                         f"is not inside the {dims[0]} x {dims[1]} grid")
+
+
+def check_bounds (instructions, dims):
+    """ check_rectangle for every row of an INSTRUCTION_DTYPE array, in one pass"""
+    bad = ((instructions['x0'] < 0) | (instructions['x0'] > instructions['x1']) | (instructions['x1'] >= dims[0])
+           | (instructions['y0'] < 0) | (instructions['y0'] > instructions['y1']) | (instructions['y1'] >= dims[1]))
+    if bad.any():
+        _, x_inds, y_inds = next(instruction_tuples(instructions[bad]))
+        check_rectangle(x_inds, y_inds, dims)
+
 # CLASS DEF
 
 
+class PackedLightGrid:
+    """ 1 bit per light: row x holds the lights (x, y) in uint64 words, y // 64 picks
+    the word and y % 64 the bit (least significant first).
+    """
+    WORD_BITS = 64
+    ALL_ON = np.uint64(2**64 - 1)
+    ROW_CHUNK = 4096  # rows per popcount pass, bounds temporaries for huge grids
+
+    def __init__(self, dims):
+        self.dims = dims
+        n_words = -(-dims[1] // self.WORD_BITS)  # ceil
+        self.words = np.zeros((dims[0], n_words), dtype='<u8')
+
+    def span_masks(self, y0, y1):
+        """ Word masks covering columns y0..y1 (inclusive), and the first word index"""
+        w0, w1 = y0 // self.WORD_BITS, y1 // self.WORD_BITS
+        masks = np.full(w1 - w0 + 1, self.ALL_ON, dtype='<u8')
+        masks[0] &= self.ALL_ON << np.uint64(y0 % self.WORD_BITS)
+        masks[-1] &= self.ALL_ON >> np.uint64(self.WORD_BITS - 1 - y1 % self.WORD_BITS)
+        return masks, w0
+
+    def apply(self, cmd, x_inds, y_inds):
+        """ Apply cmd ('turn on', 'turn off', 'toggle') to an inclusive rectangle"""
+        check_rectangle(x_inds, y_inds, self.dims)  # masks past the last word won't fit
+        masks, w0 = self.span_masks(y_inds[0], y_inds[1])
+        region = self.words[x_inds[0]: x_inds[1] + 1, w0: w0 + len(masks)]  # view
+        if cmd == 'turn on':
+            region |= masks
+        elif cmd == 'turn off':
+            region &= ~masks
+        elif cmd == 'toggle':
+            region ^= masks
+        else:
+            raise ValueError(f"unknown instruction {cmd!r}")
+
+    def count(self):
+        """ Number of lights on (popcount over all words)"""
+        total = 0
+        for start in range(0, self.dims[0], self.ROW_CHUNK):
+            chunk = self.words[start: start + self.ROW_CHUNK]
+            if hasattr(np, 'bitwise_count'):  # numpy >= 2.0
+                total += int(np.bitwise_count(chunk).sum(dtype=np.uint64))
+            else:
+                total += int(POPCOUNT_8[chunk.view(np.uint8)].sum(dtype=np.uint64))
+        return total
+
+    def to_array(self):
+        """ Unpack to one uint8 per light (only sensible for small grids)"""
+        bits = np.unpackbits(self.words.view(np.uint8), axis=1, bitorder='little')
+        return bits[:, :self.dims[1]]
+
+
+class CompressedLightGrid:
+    """ Coordinate-compressed grid: the instructions' rectangle edges split each axis
+    into intervals, cell (i, j) covers [xs[i], xs[i+1]) x [ys[j], ys[j+1]). Keeps the
+    on/off state (mode 'lit') or the AoC part 2 brightness (mode 'brightness') of
+    every cell, only the one the mode needs.
+    """
+    def __init__(self, dims, instructions, mode='lit'):
+        """ instructions: INSTRUCTION_DTYPE array, see parse_instructions"""
+        check_bounds(instructions, dims)  # edges past the grid would count lights outside it
+        self.dims = dims
+        self.mode = mode
+        self.xs = self.edges(dims[0], instructions['x0'], instructions['x1'])
+        self.ys = self.edges(dims[1], instructions['y0'], instructions['y1'])
+        self.dx = np.diff(self.xs)
+        self.dy = np.diff(self.ys)
+        if mode == 'brightness':
+            self.cells = np.zeros((len(self.dx), len(self.dy)), dtype=np.int64)
+        else:
+            self.cells = np.zeros((len(self.dx), len(self.dy)), dtype=np.uint8)
+
+    @staticmethod
+    def edges(size, lo, hi):
+        """ Sorted distinct interval starts along one axis, plus the end (size)"""
+        return np.unique(np.concatenate([[0, size], lo, hi + 1]).astype(np.int64))
+
+    def apply(self, cmd, x_inds, y_inds):
+        """ Apply cmd ('turn on', 'turn off', 'toggle') to an inclusive rectangle"""
+        # edges are all in xs/ys, so the rectangle is exactly a block of cells
+        i0, i1 = np.searchsorted(self.xs, [x_inds[0], x_inds[1] + 1])
+        j0, j1 = np.searchsorted(self.ys, [y_inds[0], y_inds[1] + 1])
+        cells = self.cells[i0: i1, j0: j1]
+        if cmd not in OPS:
+            raise ValueError(f"unknown instruction {cmd!r}")
+
+        if self.mode == 'brightness':
+            if cmd == 'turn off':
+                np.subtract(cells, 1, out=cells, where=cells > 0)  # floored at 0
+            else:
+                cells += BRIGHTNESS_STEP[OPS.index(cmd)]
+        elif cmd == 'toggle':
+            cells ^= 1
+        else:
+            cells.fill(cmd == 'turn on')
+
+    def weighted_sum(self, cell_values):
+        """ Sum of cell value * cell area, as a python int (areas reach 10^18)"""
+        row_sums = cell_values.astype(np.int64) @ self.dy  # per row of cells, < 2^63
+        return sum(int(row_sum) * int(dx) for row_sum, dx in zip(row_sums, self.dx))
+
+    def count(self):
+        """ Number of lights on"""
+        if self.mode == 'brightness':
+            raise ValueError("on/off is not tracked in brightness mode")
+        return self.weighted_sum(self.cells)
+
+    def total_brightness(self):
+        if self.mode != 'brightness':
+            raise ValueError("brightness is only tracked in brightness mode")
+        return self.weighted_sum(self.cells)
+
+    def to_array(self):
+        """ Expand to one value per light (only sensible for small grids)"""
+        return np.repeat(np.repeat(self.cells, self.dx, axis=0), self.dy, axis=1)
+
+
+class ReverseLightGrid:
+    """ Resolves the instructions from last to first (see ENGINES above). Undecided
+    lights are counted per TILE x TILE tile; each instruction works band by band (one
+    tile row at a time) and only on the span of tiles still undecided.
+    cells_touched counts the lights actually worked on, compare to the rectangle areas.
+    """
+    TILE = 32
+
+    def __init__(self, dims):
+        self.dims = dims
+        self.lit = np.zeros(dims, dtype=bool)
+        self.resolved = np.zeros(dims, dtype=bool)
+        self.parity = np.zeros(dims, dtype=bool)  # odd number of later toggles
+
+        # undecided lights per tile (edge tiles may be partial)
+        tile_rows = np.diff(np.minimum(np.arange(0, dims[0] + self.TILE, self.TILE), dims[0]))
+        tile_cols = np.diff(np.minimum(np.arange(0, dims[1] + self.TILE, self.TILE), dims[1]))
+        self.tile_live = np.outer(tile_rows[tile_rows > 0], tile_cols[tile_cols > 0])
+        self.n_live = dims[0] * dims[1]
+        self.cells_touched = 0
+
+    def resolve(self, instructions):
+        """ instructions: INSTRUCTION_DTYPE array in the original (forward) order"""
+        check_bounds(instructions, self.dims)  # tile indexes past the grid don't exist
+        T = self.TILE
+        for cmd, x_inds, y_inds in instruction_tuples(instructions[::-1]):
+            if not self.n_live:
+                break  # everything decided, the earlier instructions don't matter
+            if cmd not in ('turn on', 'turn off', 'toggle'):
+                raise ValueError(f"unknown instruction {cmd!r}")
+
+            tj0, tj1 = y_inds[0] // T, y_inds[1] // T
+            for ti in range(x_inds[0] // T, x_inds[1] // T + 1):
+                live_tiles = np.flatnonzero(self.tile_live[ti, tj0: tj1 + 1])
+                if not len(live_tiles):
+                    continue  # band already decided here
+
+                r0, r1 = max(x_inds[0], ti * T), min(x_inds[1] + 1, (ti + 1) * T)
+                c0 = max(y_inds[0], (tj0 + live_tiles[0]) * T)
+                c1 = min(y_inds[1] + 1, (tj0 + live_tiles[-1] + 1) * T)
+
+                live = ~self.resolved[r0: r1, c0: c1]
+                self.cells_touched += live.size
+                if cmd == 'toggle':
+                    self.parity[r0: r1, c0: c1] ^= live
+                    continue
+
+                # final state: this set, flipped by every later toggle
+                state = self.parity[r0: r1, c0: c1] ^ (cmd == 'turn on')
+                np.copyto(self.lit[r0: r1, c0: c1], state, where=live)
+                self.resolved[r0: r1, c0: c1] = True
+
+                # newly decided lights, summed per tile
+                tile_starts = np.arange(-(-c0 // T) * T, c1, T) - c0
+                newly = np.add.reduceat(live.sum(axis=0), np.r_[0, tile_starts[tile_starts > 0]])
+                self.tile_live[ti, c0 // T: c0 // T + len(newly)] -= newly
+                self.n_live -= int(newly.sum())
+
+        # never set: start off, flipped by the toggles
+        np.copyto(self.lit, self.parity, where=~self.resolved)
+
+    def count(self):
+        """ Number of lights on"""
+        return int(np.count_nonzero(self.lit))
+
+    def to_array(self):
+        return self.lit.astype(np.uint8)
+
+
+# popcount of every byte value, fallback for numpy without bitwise_count
+POPCOUNT_8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
 class LightDisplay:
-    def __init__(self, lines, dims=(1000, 1000)):
-        self.light_grid = np.zeros(dims)
+    ENGINES = ('dense', 'packed', 'compressed', 'reverse')
+    MODES = ('lit', 'brightness')
+    BRIGHTNESS_ENGINES = ('dense', 'compressed')
+
+    def __init__(self, lines, dims=(1000, 1000), engine='dense', mode='lit'):
+        """ lines: instruction strings, or an already parsed INSTRUCTION_DTYPE array"""
+        if engine not in self.ENGINES:
+            raise ValueError(f"unknown engine {engine!r}, expected one of {self.ENGINES}")
+        if mode not in self.MODES:
+            raise ValueError(f"unknown mode {mode!r}, expected one of {self.MODES}")
+        if mode == 'brightness' and engine not in self.BRIGHTNESS_ENGINES:
+            raise ValueError(f"brightness mode needs one of the engines {self.BRIGHTNESS_ENGINES}")
+        self.engine = engine
+        self.mode = mode
+        self.dims = dims
         self.lines = lines
+        if isinstance(lines, np.ndarray):
+            self.instructions = lines
+        else:
+            self.instructions = parse_instructions('\n'.join(lines))
+        check_bounds(self.instructions, dims)  # so every engine rejects the same input
+
+        if engine == 'packed':
+            self.light_grid = PackedLightGrid(dims)
+        elif engine == 'compressed':
+            self.light_grid = CompressedLightGrid(dims, self.instructions, mode)
+        elif engine == 'reverse':
+            self.light_grid = ReverseLightGrid(dims)
+        elif mode == 'brightness':
+            self.light_grid = np.zeros(dims, dtype=np.int64)
+        else:
+            self.light_grid = np.zeros(dims)
 
     def process_instructions(self):
-        for line in lines:
-            fcn, x_inds, y_inds = self.instruct_to_fcn(line)
+        if self.mode == 'brightness' and self.engine == 'dense':
+            self.process_brightness()
+            return
+
+        if self.engine == 'reverse':
+            self.light_grid.resolve(self.instructions)
+            return
+
+        if self.engine != 'dense':
+            for cmd, x_inds, y_inds in instruction_tuples(self.instructions):
+                self.light_grid.apply(cmd, x_inds, y_inds)
+            return
+
+        for cmd, x_inds, y_inds in instruction_tuples(self.instructions):
+            fcn = self.CMD_FCN_MAP[cmd]
 
             # NOTE: to make inclusive, we add one to upper inds
             x_inds[1] += 1
             y_inds[1] += 1
 
-            vals = self.light_grid[x_inds[0]: x_inds[1], y_inds[0]: y_inds[1]]
-            mod_vals = []
-            for val in vals.flatten():
-                mod_vals.append(fcn(val))
-            mod_vals = np.array(mod_vals).reshape(vals.shape)  # reshape to 2-D numpy array
-            self.light_grid[x_inds[0]: x_inds[1], y_inds[0]: y_inds[1]] = mod_vals
+            # slicing gives a view, fcn modifies the grid in place
+            fcn(self.light_grid[x_inds[0]: x_inds[1], y_inds[0]: y_inds[1]])
+
+    def process_brightness(self):
+        """ Dense brightness: additive runs in bulk, "turn off"s as floored slices"""
+        turn_off = OPS.index('turn off')
+        start = 0
+        for stop in np.flatnonzero(self.instructions['op'] == turn_off).tolist() + [len(self.instructions)]:
+            self.add_brightness(self.instructions[start: stop])
+            if stop < len(self.instructions):
+                _, x0, y0, x1, y1 = self.instructions[stop].tolist()
+                region = self.light_grid[x0: x1 + 1, y0: y1 + 1]
+                np.subtract(region, 1, out=region, where=region > 0)  # floored at 0
+            start = stop + 1
+
+    def add_brightness(self, run):
+        """ Apply a run of additive instructions (no "turn off") to the dense grid"""
+        if not len(run):
+            return
+        steps = BRIGHTNESS_STEP[run['op']]
+        area = int(((run['x1'] - run['x0'] + 1) * (run['y1'] - run['y0'] + 1)).sum())
+
+        if area < self.light_grid.size:
+            # cheaper than a pass over the whole grid
+            for step, (_, x0, y0, x1, y1) in zip(steps.tolist(), run.tolist()):
+                self.light_grid[x0: x1 + 1, y0: y1 + 1] += step
+            return
+
+        # 2D difference array: +step at the rectangle's first corner, -step just past
+        # each edge, +step past the far corner; two prefix sums give the brightness
+        diff = np.zeros((self.dims[0] + 1, self.dims[1] + 1), dtype=np.int64)
+        np.add.at(diff, (run['x0'], run['y0']), steps)
+        np.add.at(diff, (run['x0'], run['y1'] + 1), -steps)
+        np.add.at(diff, (run['x1'] + 1, run['y0']), -steps)
+        np.add.at(diff, (run['x1'] + 1, run['y1'] + 1), steps)
+        np.cumsum(diff, axis=0, out=diff)
+        np.cumsum(diff, axis=1, out=diff)
+        self.light_grid += diff[:-1, :-1]
 
     def print_pretty(self):
         """ right now just print, could do a pretty print w/ shapes/colors"""
-        for line in self.light_grid:
+        grid = self.light_grid if self.engine == 'dense' else self.light_grid.to_array()
+        for line in grid:
             print(''.join(str(int(x)).replace('.', '') for x in list(line)))
 
+    def lit_count(self):
+        if self.mode == 'brightness' and self.engine == 'dense':
+            raise ValueError("the dense grid holds brightness, not on/off, in brightness mode")
+        if self.engine == 'dense':
+            return int(self.light_grid.sum())
+        return self.light_grid.count()
+
     def count_illuminated(self):
-        print(f"{int(self.light_grid.sum())} of {int(self.light_grid.shape[0] * self.light_grid.shape[1])} illuminated")
+        print(f"{self.lit_count()} of {self.dims[0] * self.dims[1]} illuminated")
 
+    def total_brightness(self):
+        if self.mode != 'brightness':
+            raise ValueError("brightness is only tracked in brightness mode")
+        if self.engine == 'dense':
+            return int(self.light_grid.sum())
+        return self.light_grid.total_brightness()
 
-    @staticmethod
-    def instruct_to_fcn (instruct_string):
-        """ Parse strings to functions to execute on range"""
-        # Define dict of fucntions to apply to range
-        CMD_FCN_MAP = {
-            'turn on': lambda x: 1,
-            'turn off': lambda x: 0,
-            'toggle': lambda x: abs(x-1),
-        }
-
-        fcn = []  # init empty
-        for key in CMD_FCN_MAP.keys():
+    def print_brightness(self):
+        print(f"total brightness {self.total_brightness()}")
+
+    # Define dict of fucntions to apply (in place) to a range of the dense grid
+    CMD_FCN_MAP = {
+        'turn on': lambda region: region.fill(1),
+        'turn off': lambda region: region.fill(0),
+        'toggle': lambda region: np.subtract(1, region, out=region),
+    }
+
+    @classmethod
+    def instruct_to_fcn (cls, instruct_string):
+        """ Parse strings to functions to execute (in place) on a range of the grid"""
+        cmd, x_inds, y_inds = cls.parse_instruction(instruct_string)
+        return cls.CMD_FCN_MAP[cmd], x_inds, y_inds
+
+    @classmethod
+    def parse_instruction (cls, instruct_string):
+        """ Parse strings to the command name and its inclusive x/y index ranges"""
+        cmd = None
+        for key in cls.CMD_FCN_MAP.keys():
             if key in instruct_string:
-                fcn = CMD_FCN_MAP[key]
+                cmd = key
                 break
-        if not fcn:
+        if not cmd:
             print(f"ERROR: unknown instruction in {instruct_string}")
             exit(-1)
 
@@ -100,25 +501,41 @@ class LightDisplay:
         x_inds = [int(tmp0[0]), int(tmp1[0])]
         y_inds = [int(tmp0[1]), int(tmp1[1])]
 
-        return fcn, x_inds, y_inds
+        return cmd, x_inds, y_inds
 
 # MAIN
-def main (lines):
+def main (lines, dims=(1000, 1000), engine='dense', mode='lit'):
     # init class instance:
-    light_display = LightDisplay(lines=lines)
+    light_display = LightDisplay(lines=lines, dims=dims, engine=engine, mode=mode)
     light_display.process_instructions()
+    if mode == 'brightness':
+        light_display.print_brightness()
+        return
     if False:
         light_display.print_pretty()
     light_display.count_illuminated()
 
 
 if __name__ == '__main__':
-    # input here is a simple txt list, wont do anything fancy.
-    with open('./inputs/day6_input.txt') as f:
-        lines = f.readlines()
-    # Strip newlines:
-    for i,line in enumerate(lines):
-        lines[i] = line.strip('\n')
-    f.close()
-
-    main(lines=lines)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('input_file', nargs='?', default='./inputs/day6_input.txt',
+                        help="instruction file (default: ./inputs/day6_input.txt)")
+    parser.add_argument('-e', '--engine', choices=LightDisplay.ENGINES, default='dense',
+                        help="grid storage / execution engine (default: dense)")
+    parser.add_argument('--dims', type=int, nargs=2, default=(1000, 1000), metavar=('X', 'Y'),
+                        help="grid dimensions (default: 1000 1000)")
+    parser.add_argument('-b', '--brightness', action='store_true',
+                        help="part 2: report total brightness (engines: dense, compressed)")
+    args = parser.parse_args()
+    if args.brightness and args.engine not in LightDisplay.BRIGHTNESS_ENGINES:
+        parser.error(f"--brightness needs one of the engines {LightDisplay.BRIGHTNESS_ENGINES}")
+
+    with open(args.input_file, 'rb') as f:
+        instructions = parse_instructions(f)
+
+    try:
+        main(lines=instructions, dims=tuple(args.dims), engine=args.engine,
+             mode='brightness' if args.brightness else 'lit')
+    except ValueError as error:
+        print(f"ERROR: {error}")
+        exit(-1)
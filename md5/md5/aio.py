@@ -0,0 +1,98 @@
+""" asyncio front-end for Md5
+
+    Hashes an asyncio.StreamReader (or any async iterator of bytes) chunk by chunk.
+    Small chunks are compressed inline; chunks of at least offload_size bytes are
+    compressed in an executor so the event loop stays responsive. hash_streams() runs
+    many streams concurrently with a bound on the bytes being hashed at once. A stream
+    only reads its next chunk once the last one is hashed, so it holds at most one.
+"""
+
+# =====================
+# IMPORTS
+# =====================
+import asyncio
+
+from .md5 import Md5
+
+# =====================
+# DEFAULTS
+# =====================
+
+CHUNK_SIZE = 2**16  # bytes per read from a StreamReader
+OFFLOAD_SIZE = 2**12  # chunks this big or bigger are compressed in the executor
+MAX_IN_FLIGHT = 2**24  # hash_streams: bytes being hashed at once, across all streams
+
+# =====================
+# ASYNC FCNS
+# =====================
+
+
+async def iter_chunks (stream, chunk_size=CHUNK_SIZE):
+    """ Chunks from a StreamReader-like object (has a read() coroutine) or an async iterator"""
+    if hasattr(stream, 'read'):
+        while True:
+            chunk = await stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        async for chunk in stream:
+            yield chunk
+
+
+def update_hasher (md5, chunk):
+    """ Executor job. Returns the hasher, so it also works with a process pool (which
+    works on and returns a pickled copy)
+    """
+    md5.update(chunk)
+    return md5
+
+
+async def hash_stream (stream, engine='fast', chunk_size=CHUNK_SIZE, offload_size=OFFLOAD_SIZE,
+                       executor=None, limiter=None):
+    """ Hash a stream, returns the Md5 hasher (call hexdigest() etc. on it).
+    executor defaults to the loop's default (thread) executor. limiter is an optional
+    asyncio.Semaphore held while a chunk is hashed. It is not held while waiting for
+    data, so idle or slow streams don't hold up the ones that have data ready.
+    """
+    loop = asyncio.get_running_loop()
+    md5 = Md5(engine=engine)
+    chunks = iter_chunks(stream, chunk_size)
+
+    while True:
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            return md5
+
+        if limiter:
+            await limiter.acquire()
+        try:
+            # released whatever happens: hashing errors, cancellation
+            if len(chunk) >= offload_size:
+                md5 = await loop.run_in_executor(executor, update_hasher, md5, chunk)
+            else:
+                md5.update(chunk)
+        finally:
+            if limiter:
+                limiter.release()
+
+
+async def hash_streams (streams, engine='fast', chunk_size=CHUNK_SIZE, offload_size=OFFLOAD_SIZE,
+                        executor=None, max_in_flight=MAX_IN_FLIGHT):
+    """ Hash many streams concurrently. At most max_in_flight bytes (in whole chunks, at
+    least one) are hashed at once. Returns the hashers, in order.
+    If a stream fails, the others are cancelled and the error is raised.
+    """
+    limiter = asyncio.Semaphore(max(1, max_in_flight // chunk_size))
+    tasks = [
+        asyncio.ensure_future(hash_stream(stream, engine=engine, chunk_size=chunk_size,
+                                          offload_size=offload_size, executor=executor, limiter=limiter))
+        for stream in streams
+    ]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
@@ -0,0 +1,132 @@
+""" Backend dispatch for md5
+
+    new(data) returns a hashlib-style md5 hasher from the best trusted backend:
+    1. "hashlib": the C implementation in hashlib, when present and not blocked by
+       FIPS policy (FIPS builds raise ValueError from hashlib.md5)
+    2. "fast": this package's Md5 with the "fast" engine (pure python fallback)
+    ("reference": Md5 with the bitarray engine, only when forced)
+
+    Before a backend is trusted it must pass a self-test of known vectors (RFC 1321
+    test suite). The choice is made once, on first use, and can be forced with the
+    MD5_BACKEND environment variable or set_backend().
+"""
+
+# =====================
+# IMPORTS
+# =====================
+import hashlib
+import os
+
+from .md5 import Md5
+
+# =====================
+# BACKENDS
+# =====================
+
+ENV_VAR = 'MD5_BACKEND'
+AUTO_ORDER = ('hashlib', 'fast')  # tried in order by "auto"
+BACKENDS = ('hashlib', 'fast', 'reference')
+
+# RFC 1321 A.5 test suite: (message, hex digest)
+KNOWN_VECTORS = (
+    (b'', 'd41d8cd98f00b204e9800998ecf8427e'),
+    (b'a', '0cc175b9c0f1b6a831c399e269772661'),
+    (b'abc', '900150983cd24fb0d6963f7d28e17f72'),
+    (b'message digest', 'f96b697d7cb7938d525a2f31aaf161d0'),
+    (b'abcdefghijklmnopqrstuvwxyz', 'c3fcd3d76192e4007dfb496cca67e13b'),
+    (b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789', 'd174ab98d277d9f5a5611c2c9f419d9f'),
+    (b'1234567890' * 8, '57edf4a22be3c955ac49da2e2107b67a'),
+)
+
+
+def hashlib_md5 (data=b''):
+    """ hashlib's md5. Declared not for security use, which some FIPS builds allow"""
+    try:
+        return hashlib.md5(data, usedforsecurity=False)
+    except TypeError:  # python < 3.9: no usedforsecurity argument
+        return hashlib.md5(data)
+
+
+def fast_md5 (data=b''):
+    # not Md5(data): that reads a str as a file path or text, hashlib.md5 raises TypeError
+    md5 = Md5(engine='fast')
+    md5.update(data)
+    return md5
+
+
+def reference_md5 (data=b''):
+    md5 = Md5(engine='reference')
+    md5.update(data)
+    return md5
+
+
+CONSTRUCTORS = {
+    'hashlib': hashlib_md5,
+    'fast': fast_md5,
+    'reference': reference_md5,
+}
+
+# name of the backend in use, chosen on first use
+selected_backend = None
+
+# =====================
+# SELF-TEST / SELECTION
+# =====================
+
+
+def self_test (name):
+    """ True if the backend produces the known digests, in one go and fed in pieces
+    (through a copy). Any error (e.g. FIPS policy) counts as a failure.
+    """
+    constructor = CONSTRUCTORS[name]
+    try:
+        for msg, expected in KNOWN_VECTORS:
+            if constructor(msg).hexdigest() != expected:
+                return False
+
+            split = len(msg) // 2
+            md5 = constructor(msg[:split]).copy()
+            md5.update(msg[split:])
+            if md5.hexdigest() != expected:
+                return False
+    except Exception:
+        return False
+    return True
+
+
+def set_backend (name='auto'):
+    """ Select the backend: one of BACKENDS, or "auto" for the first of AUTO_ORDER that
+    passes the self-test. A named backend that fails the self-test raises RuntimeError.
+    Returns the name selected.
+    """
+    global selected_backend
+
+    if name == 'auto':
+        for candidate in AUTO_ORDER:
+            if self_test(candidate):
+                selected_backend = candidate
+                return selected_backend
+        raise RuntimeError(f"no md5 backend passed the self-test (tried {AUTO_ORDER})")
+
+    if name not in BACKENDS:
+        raise ValueError(f"unknown md5 backend '{name}', choose from {BACKENDS + ('auto',)}")
+    if not self_test(name):
+        raise RuntimeError(f"md5 backend '{name}' failed the self-test")
+    selected_backend = name
+    return selected_backend
+
+
+def get_backend ():
+    """ Name of the backend in use. On first call, selects it from MD5_BACKEND (default "auto")"""
+    if selected_backend is None:
+        set_backend(os.environ.get(ENV_VAR, 'auto').strip().lower() or 'auto')
+    return selected_backend
+
+
+def new (data=b''):
+    """ New md5 hasher (hashlib interface) from the selected backend"""
+    return CONSTRUCTORS[get_backend()](data)
+
+
+# drop-in for `from hashlib import md5`
+md5 = new
@@ -0,0 +1,167 @@
+""" Multi-lane batch md5 on NumPy arrays
+
+    Hashing many short messages one Md5 object at a time is dominated by per-object
+    python overhead. Here every message gets its own "lane": the blocks of all messages
+    are packed into uint32 arrays (one column per message) and each of the 64 md5 steps
+    runs once, as a vectorized array operation, across all lanes at once (SIMD style).
+
+    Messages of different lengths have different block counts. md5_batch first groups
+    the messages by block count (within a factor of 2), so one long message doesn't
+    make every lane of the batch pad to its length. Groups of only a few lanes (e.g. a
+    lone long message) are cheaper with the scalar Md5 and go there. Within a group, lanes whose message
+    has run out of blocks are masked, so their state is carried through unchanged.
+
+    All lanes can start from a shared midstate (see Md5.export_midstate), e.g. a common
+    prefix or the key pad of HMAC, instead of the initial A:D words.
+"""
+
+# =====================
+# IMPORTS
+# =====================
+import numpy as np
+
+from .md5 import K_SINES, STEP_SHIFTS, STEP_WORD_INDS, Md5
+
+# =====================
+# CONSTANTS
+# =====================
+
+# K as uint32, so adding it to the lane arrays stays uint32
+K_SINES_U32 = np.array(K_SINES, dtype=np.uint32)
+
+# Lanes per pass of the step loop, bounds the memory of the packed word arrays
+BATCH_LANES = 2**16
+
+# Smaller lane groups are hashed one message at a time with Md5, the per-step NumPy
+# overhead would cost more than the lanes save
+MIN_LANES = 16
+
+# =====================
+# BATCH FCNS
+# =====================
+
+
+def md5_batch (messages, lanes=BATCH_LANES, midstate=None):
+    """ Hash many messages at once. Returns a list of 16-byte digests, in order.
+    With a midstate, each digest is of (the prefix behind the midstate + message).
+    lanes (messages per NumPy pass) is raised to MIN_LANES: fewer would always go to
+    the scalar Md5.
+    """
+    messages = list(messages)
+    lanes = max(lanes, MIN_LANES)
+    prefix_len = midstate[1] if midstate else 0
+    digests = [None] * len(messages)
+    for group in lane_groups(messages, lanes, prefix_len):
+        group_messages = [messages[i] for i in group]
+        if len(group) < MIN_LANES:
+            group_digests = md5_scalar(group_messages, midstate=midstate)
+        else:
+            group_digests = md5_lanes(group_messages, midstate=midstate)
+        for ind, digest in zip(group, group_digests):
+            digests[ind] = digest
+    return digests
+
+
+def md5_scalar (messages, midstate=None):
+    """ Hash messages one at a time with Md5, for groups too small for lanes"""
+    digests = []
+    for msg in messages:
+        md5 = Md5.from_midstate(midstate) if midstate else Md5()
+        md5.update(msg)
+        digests.append(md5.digest())
+    return digests
+
+
+def lane_groups (messages, lanes=BATCH_LANES, prefix_len=0):
+    """ Split message indexes into groups of at most lanes, where all block counts are
+    within a factor of 2 (same bit length). Padding a group to its longest message then
+    costs at most 2x its own size. Indexes keep their input order within a group.
+    """
+    blk_counts = np.array([(prefix_len + len(msg) + 8) // 64 + 1 for msg in messages], dtype=np.int64)
+    size_classes = np.frexp(blk_counts.astype(np.float64))[1]  # bit length
+    order = np.argsort(size_classes, kind='stable')
+
+    # new group at every size class change, and every lanes indexes within a class
+    class_starts = np.flatnonzero(np.diff(size_classes[order])) + 1
+    groups = []
+    for class_inds in np.split(order, class_starts):
+        for offset in range(0, len(class_inds), lanes):
+            groups.append(class_inds[offset: offset + lanes].tolist())
+    return groups
+
+
+def md5_lanes (messages, midstate=None):
+    """ Hash messages in a single pass, one lane per message"""
+    if not messages:
+        return []
+    for msg in messages:
+        if isinstance(msg, str):
+            raise TypeError("Strings must be encoded before hashing")
+
+    init_words, prefix_len = midstate if midstate else (Md5.INIT_WORDS, 0)
+    m_32bit_words, blk_counts = pack_lanes(messages, prefix_len)
+    state = tuple(np.full(len(messages), word, dtype=np.uint32) for word in init_words)
+
+    for blk in range(0, m_32bit_words.shape[0]):
+        new_state = compress_lanes(state, m_32bit_words[blk])
+        if blk < blk_counts.min():
+            state = new_state  # every lane still has blocks
+        else:
+            active = blk < blk_counts  # per-lane mask
+            state = tuple(np.where(active, new, old) for new, old in zip(new_state, state))
+
+    # (lanes, 4) little endian words -> 16 digest bytes per lane
+    digest_bytes = np.stack(state, axis=1).astype('<u4').tobytes()
+    return [digest_bytes[i: i + 16] for i in range(0, len(digest_bytes), 16)]
+
+
+def pack_lanes (messages, prefix_len=0):
+    """ Pad every message and pack the words into a (blocks, 16, lanes) uint32 array,
+    zero filled past the end of shorter messages. Also returns block count per lane.
+    prefix_len bytes (already compressed into a midstate) count towards the padded length.
+    """
+    padded = [bytes(msg) + Md5.padding_bytes(prefix_len + len(msg)) for msg in messages]
+    word_counts = np.array([len(msg) // 4 for msg in padded], dtype=np.int64)
+    blk_counts = word_counts // 16
+
+    # scatter all words into (lanes, max words) in one go
+    flat_words = np.frombuffer(b''.join(padded), dtype='<u4')
+    lane_inds = np.repeat(np.arange(len(padded)), word_counts)
+    word_starts = np.cumsum(word_counts) - word_counts
+    word_inds = np.arange(len(flat_words)) - np.repeat(word_starts, word_counts)
+
+    words = np.zeros((len(padded), int(word_counts.max())), dtype=np.uint32)
+    words[lane_inds, word_inds] = flat_words
+
+    # one contiguous (lanes,) row per (block, word)
+    m_32bit_words = np.ascontiguousarray(words.reshape(len(padded), -1, 16).transpose(1, 2, 0))
+    return m_32bit_words, blk_counts
+
+
+def compress_lanes (state, m_32bit_words):
+    """ 64 md5 steps for one block in every lane. state is (A, B, C, D) arrays,
+    m_32bit_words is a (16, lanes) array. uint32 arithmetic wraps mod 2**32.
+    """
+    a_hash, b_hash, c_hash, d_hash = state
+
+    for i in range(0, 64):
+        if i <= 15:
+            fcn = (b_hash & c_hash) | (~b_hash & d_hash)
+        elif i <= 31:
+            fcn = (b_hash & d_hash) | (~d_hash & c_hash)
+        elif i <= 47:
+            fcn = b_hash ^ c_hash ^ d_hash
+        else:
+            fcn = c_hash ^ (b_hash | ~d_hash)
+
+        fcn = fcn + a_hash + K_SINES_U32[i] + m_32bit_words[STEP_WORD_INDS[i]]
+        shift = STEP_SHIFTS[i]
+        a_hash, d_hash, c_hash = d_hash, c_hash, b_hash
+        b_hash = b_hash + ((fcn << shift) | (fcn >> (32 - shift)))
+
+    return (
+        state[0] + a_hash,
+        state[1] + b_hash,
+        state[2] + c_hash,
+        state[3] + d_hash,
+    )
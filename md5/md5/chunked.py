@@ -0,0 +1,170 @@
+""" Chunked parallel digests for very large files
+
+    Whole-file md5 is serial: every block depends on the one before. Here the file is
+    split into fixed-size chunks (default 64 MB), the chunks are hashed in parallel
+    across processes, and the result is a list of chunk digests plus a combined
+    digest-of-digests, like S3 multipart-upload ETags: md5(chunk digests) + "-<count>".
+
+    The chunk manifest (JSON) is saved as chunks complete, so an interrupted run
+    resumes with the missing chunks only, and single chunks can be re-verified.
+"""
+
+# =====================
+# IMPORTS
+# =====================
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .manifest import load_json, save_json
+from .md5 import Md5
+
+# =====================
+# CHUNK HASHING
+# =====================
+
+CHUNK_SIZE = 64 * 2**20
+MANIFEST_VERSION = 1
+
+
+def hash_chunk (filepath, offset, length, engine='fast'):
+    """ Hex digest of length bytes of the file from offset (pool worker). The file is
+    memory-mapped and the chunk is hashed from a memoryview, without copying.
+    """
+    md5 = Md5(engine=engine)
+    if length:
+        with open(filepath, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    md5.update(view[offset: offset + length])
+    return md5.hexdigest()
+
+
+def combined_digest (chunk_digests):
+    """ Digest-of-digests: md5 of the concatenated binary chunk digests, "-<chunk count>" """
+    md5 = Md5(b''.join(bytes.fromhex(digest) for digest in chunk_digests))
+    return f"{md5.hexdigest()}-{len(chunk_digests)}"
+
+
+def chunk_length (size, chunk_size, index):
+    return min(chunk_size, size - index * chunk_size)
+
+# =====================
+# MANIFEST
+# =====================
+
+
+def new_manifest (filepath, chunk_size):
+    stat = os.stat(filepath)
+    chunk_count = max(1, -(-stat.st_size // chunk_size))  # an empty file is one empty chunk
+    return {
+        'version': MANIFEST_VERSION,
+        'path': filepath,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'chunk_size': chunk_size,
+        'chunks': [None] * chunk_count,  # hex digest per chunk, None until hashed
+        'digest': None,
+    }
+
+
+def load_manifest (manifest_path):
+    return load_json(manifest_path, MANIFEST_VERSION, kind='chunk manifest')
+
+
+def save_manifest (manifest_path, manifest):
+    save_json(manifest_path, manifest)  # atomic, an interrupted run keeps the last good copy
+
+
+def resumable_manifest (manifest_path, filepath, chunk_size):
+    """ Existing manifest if it is for the same file (path, size, mtime) and chunk size,
+    otherwise a new one
+    """
+    manifest = new_manifest(filepath, chunk_size)
+    if not os.path.isfile(manifest_path):
+        return manifest
+
+    old = load_manifest(manifest_path)
+    if all(old[key] == manifest[key] for key in ('path', 'size', 'mtime_ns', 'chunk_size')):
+        return old
+    return manifest
+
+# =====================
+# HASH / VERIFY
+# =====================
+
+
+def hash_chunks (filepath, indexes, chunk_size, size, engine='fast', jobs=None):
+    """ Hash the given chunk indexes across a process pool. Yields (index, hexdigest)
+    as chunks complete (any order)
+    """
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                hash_chunk, filepath, index * chunk_size, chunk_length(size, chunk_size, index), engine
+            ): index
+            for index in indexes
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def chunked_digest (filepath, manifest_path, chunk_size=CHUNK_SIZE, engine='fast', jobs=None):
+    """ Hash filepath chunk by chunk in parallel, recording digests in manifest_path as they
+    complete. Chunks already in a matching manifest are not hashed again (resume).
+    Returns the completed manifest.
+    """
+    manifest = resumable_manifest(manifest_path, filepath, chunk_size)
+    pending = [index for index, digest in enumerate(manifest['chunks']) if digest is None]
+
+    for index, hexdigest in hash_chunks(filepath, pending, chunk_size, manifest['size'], engine, jobs):
+        manifest['chunks'][index] = hexdigest
+        save_manifest(manifest_path, manifest)
+
+    manifest['digest'] = combined_digest(manifest['chunks'])
+    save_manifest(manifest_path, manifest)
+    return manifest
+
+
+def verify_chunks (manifest_path, indexes=None, engine='fast', jobs=None):
+    """ Re-hash chunks (default: all) of the file in a manifest. Returns sorted
+    (index, ok) pairs. Raises ValueError for indexes the manifest doesn't have.
+    """
+    manifest = load_manifest(manifest_path)
+    if indexes is None:
+        indexes = range(0, len(manifest['chunks']))
+    bad_indexes = [index for index in indexes if index not in range(0, len(manifest['chunks']))]
+    if bad_indexes:
+        raise ValueError(f"chunk index(es) {', '.join(map(str, bad_indexes))} out of range, "
+                         f"{manifest_path} has chunks 0..{len(manifest['chunks']) - 1}")
+    results = hash_chunks(manifest['path'], indexes, manifest['chunk_size'], manifest['size'], engine, jobs)
+    return sorted((index, hexdigest == manifest['chunks'][index]) for index, hexdigest in results)
+
+# =====================
+# CLI
+# =====================
+
+
+def print_chunked (filepath, manifest_path, chunk_size=CHUNK_SIZE, engine='fast', jobs=None):
+    manifest = chunked_digest(filepath, manifest_path, chunk_size=chunk_size, engine=engine, jobs=jobs)
+    print(f"{manifest['digest']}  {filepath}")
+    return 0
+
+
+def print_verify (manifest_path, indexes=None, engine='fast', jobs=None):
+    """ Per-chunk OK/FAILED, like md5sum -c. Returns exit status"""
+    manifest = load_manifest(manifest_path)
+    try:
+        results = verify_chunks(manifest_path, indexes, engine=engine, jobs=jobs)
+    except ValueError as error:
+        print(f"md5: {error}", file=sys.stderr)
+        return 2
+    failed = 0
+    for index, ok in results:
+        print(f"{manifest['path']} chunk {index}: {'OK' if ok else 'FAILED'}")
+        failed += not ok
+    if failed:
+        print(f"md5: WARNING: {failed} chunk checksum(s) did NOT match", file=sys.stderr)
+    return 1 if failed else 0
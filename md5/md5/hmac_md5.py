@@ -0,0 +1,108 @@
+""" HMAC-MD5 (RFC 2104) on top of Md5
+
+    HMAC(K, m) = H((K' ^ opad) || H((K' ^ ipad) || m)), K' = key zero padded to one block
+    (keys longer than a block are hashed first).
+
+    The ipad and opad blocks only depend on the key, so they are compressed once when
+    the key is set and kept as midstates. Each MAC then costs the message blocks plus
+    one outer block, instead of recompressing both key pads every call.
+"""
+
+# =====================
+# IMPORTS
+# =====================
+import hmac
+
+from .batch import md5_batch
+from .md5 import Md5
+
+# =====================
+# CLASS DEF
+# =====================
+
+
+class HmacMd5:
+    """ Same interface as hmac.new(key, msg, 'md5'): update/copy/digest/hexdigest,
+    plus one-shot mac() and verify()/verify_batch() for many messages under one key
+    """
+
+    name = 'hmac-md5'
+    digest_size = Md5.digest_size
+    block_size = Md5.block_size
+
+    IPAD = 0x36
+    OPAD = 0x5c
+
+    def __init__(self, key, msg=None, engine='fast'):
+        """ Class constructor. Compresses the key pads once"""
+        if isinstance(key, str):
+            raise TypeError("Strings must be encoded before hashing")
+        self.engine = engine
+
+        key = bytes(key)
+        if len(key) > self.block_size:
+            key = Md5(key, engine=engine).digest()
+        key = key.ljust(self.block_size, b'\x00')
+
+        # (K' ^ ipad) and (K' ^ opad) are exactly one block each: keep their midstates
+        self.inner_midstate = Md5(bytes(k ^ self.IPAD for k in key), engine=engine).export_midstate()
+        self.outer_midstate = Md5(bytes(k ^ self.OPAD for k in key), engine=engine).export_midstate()
+
+        # Hashers sitting on the pads, copied for every MAC
+        self.inner_start = Md5.from_midstate(self.inner_midstate, engine=engine)
+        self.outer_start = Md5.from_midstate(self.outer_midstate, engine=engine)
+
+        self.inner = self.inner_start.copy()  # running inner hash for update()
+        if msg is not None:
+            self.update(msg)
+
+    def update (self, msg):
+        self.inner.update(msg)
+
+    def copy (self):
+        """ Return a clone of the running MAC (pad midstates are shared)"""
+        clone = HmacMd5.__new__(HmacMd5)
+        clone.__dict__.update(self.__dict__)
+        clone.inner = self.inner.copy()
+        return clone
+
+    def digest (self):
+        """ MAC of everything fed to update() so far, running state is left untouched"""
+        return self.finish(self.inner.digest())
+
+    def hexdigest (self):
+        return self.digest().hex()
+
+    def finish (self, inner_digest):
+        """ Outer hash: one block on top of the opad midstate"""
+        outer = self.outer_start.copy()
+        outer.update(inner_digest)
+        return outer.digest()
+
+    def mac (self, msg):
+        """ One-shot MAC of msg under this key, independent of update()"""
+        inner = self.inner_start.copy()
+        inner.update(msg)
+        return self.finish(inner.digest())
+
+    def verify (self, msg, tag):
+        """ Constant time check of tag (digest bytes or hex string) against mac(msg)"""
+        return self.tag_matches(self.mac(msg), tag)
+
+    def verify_batch (self, pairs):
+        """ Check many (msg, tag) pairs under this key. Returns a list of bools, in order.
+        Uses the NumPy batch engine: all inner hashes start from the ipad midstate, then
+        all outer hashes from the opad midstate. md5_batch groups the messages by length,
+        so one large body doesn't make every signature in the batch pay for its length.
+        """
+        pairs = list(pairs)
+        inner_digests = md5_batch([msg for msg, _ in pairs], midstate=self.inner_midstate)
+        macs = md5_batch(inner_digests, midstate=self.outer_midstate)
+        return [self.tag_matches(expected, tag) for expected, (_, tag) in zip(macs, pairs)]
+
+    @staticmethod
+    def tag_matches (expected, tag):
+        """ Constant time compare, tag is digest bytes or hex string"""
+        if isinstance(tag, str):
+            return hmac.compare_digest(expected.hex(), tag.lower())
+        return hmac.compare_digest(expected, bytes(tag))
@@ -0,0 +1,141 @@
+""" Incremental checksum manifest
+
+    An on-disk index (JSON) of path -> size, mtime, inode and md5 digest. Updating the
+    manifest only re-hashes files whose stat signature changed since the last run;
+    everything else keeps its recorded digest. check_manifest() re-hashes every file
+    in parallel and compares against the index, like `md5sum -c`.
+"""
+
+# =====================
+# IMPORTS
+# =====================
+import json
+import os
+import sys
+
+from .md5 import iter_file_paths, sum_files
+
+# =====================
+# INDEX FILE
+# =====================
+
+MANIFEST_VERSION = 1
+
+
+def stat_signature (stat):
+    """ Fields that must all match for a file to be considered unchanged"""
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'inode': stat.st_ino}
+
+
+def load_json (path, version, kind='manifest'):
+    """ JSON document from path, ValueError unless its 'version' is version"""
+    with open(path, 'r') as f:
+        document = json.load(f)
+    if document.get('version') != version:
+        raise ValueError(f"unsupported {kind} version in {path}: {document.get('version')}")
+    return document
+
+
+def save_json (path, document, **json_kwargs):
+    """ Write atomically (temp file + rename), so an interrupted run keeps the old copy"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(document, f, indent=1, **json_kwargs)
+    os.replace(tmp_path, path)
+
+
+def load_manifest (index_path):
+    """ Returns {path: entry} from index_path, empty if the file doesn't exist yet"""
+    if not os.path.isfile(index_path):
+        return {}
+    return load_json(index_path, MANIFEST_VERSION)['files']
+
+
+def save_manifest (index_path, files):
+    save_json(index_path, {'version': MANIFEST_VERSION, 'files': files}, sort_keys=True)
+
+# =====================
+# UPDATE / CHECK
+# =====================
+
+
+def update_manifest (index_path, paths, engine='fast', jobs=None):
+    """ Bring the index in line with the files under paths (directories are recursed
+    into). Only files whose size/mtime/inode changed are re-hashed, in parallel.
+    Returns (files, hashed, errors): the new index, paths re-hashed and (path, error) pairs.
+    """
+    old_files = load_manifest(index_path)
+    files = {}
+    changed = {}  # path: signature taken before hashing, so a later write is seen as a change
+    errors = []
+
+    index_realpath = os.path.realpath(index_path)
+    for path in iter_file_paths(paths):
+        if os.path.realpath(path) in (index_realpath, index_realpath + '.tmp'):
+            continue  # don't index the index
+        try:
+            signature = stat_signature(os.stat(path))
+        except OSError as err:
+            errors.append((path, err.strerror))
+            continue
+
+        entry = old_files.get(path)
+        if entry and all(entry[key] == val for key, val in signature.items()):
+            files[path] = entry
+        else:
+            changed[path] = signature
+
+    hashed = []
+    for path, hexdigest, error in sum_files(list(changed), engine=engine, jobs=jobs):
+        if error:
+            errors.append((path, error))
+            continue
+        files[path] = dict(changed[path], digest=hexdigest)
+        hashed.append(path)
+
+    save_manifest(index_path, files)
+    return files, hashed, errors
+
+
+def check_manifest (index_path, engine='fast', jobs=None):
+    """ Re-hash every file in the index in parallel. Yields (path, status) in index
+    order, status is 'OK', 'FAILED' or 'FAILED open or read' (as md5sum -c)
+    """
+    files = load_manifest(index_path)
+    for path, hexdigest, error in sum_files(sorted(files), engine=engine, jobs=jobs):
+        if error:
+            yield path, 'FAILED open or read'
+        elif hexdigest != files[path]['digest']:
+            yield path, 'FAILED'
+        else:
+            yield path, 'OK'
+
+# =====================
+# CLI
+# =====================
+
+
+def print_update (index_path, paths, engine='fast', jobs=None):
+    """ Update the manifest, print a summary. Returns exit status"""
+    files, hashed, errors = update_manifest(index_path, paths, engine=engine, jobs=jobs)
+    for path, error in errors:
+        print(f"md5: {path}: {error}", file=sys.stderr)
+    print(f"{index_path}: {len(files)} files, {len(hashed)} hashed, {len(files) - len(hashed)} unchanged")
+    return 1 if errors else 0
+
+
+def print_check (index_path, engine='fast', jobs=None):
+    """ md5sum -c style output, warnings on stderr. Returns exit status"""
+    unreadable = mismatched = 0
+    for path, status in check_manifest(index_path, engine=engine, jobs=jobs):
+        print(f"{path}: {status}", flush=True)
+        if status == 'FAILED':
+            mismatched += 1
+        elif status != 'OK':
+            unreadable += 1
+
+    if unreadable:
+        print(f"md5: WARNING: {unreadable} listed file(s) could not be read", file=sys.stderr)
+    if mismatched:
+        print(f"md5: WARNING: {mismatched} computed checksum(s) did NOT match", file=sys.stderr)
+    return 1 if (unreadable or mismatched) else 0
@@ -12,6 +12,13 @@
     https://www.rfc-editor.org/rfc/rfc1321 (OG source)
     https://blog.jpolak.org/?p=1985 (excellent explanation of source of values)
 
+    ENGINES:
+    "fast" -- keeps A, B, C, D and M[0..15] as native ints, masked to 32 bits
+    after each add/rotate. The 64 steps run as unrolled code, generated once from
+    the constant tables below (see build_unrolled_compress). This is the default.
+    "reference" -- original bitarray implementation, step by step. Much slower,
+    kept for teaching and for cross-checking the fast engine.
+
     TODO:
      1. learn more about class vs static methods and update.
      https://www.geeksforgeeks.org/class-method-vs-static-method-python/
@@ -23,131 +30,412 @@
 # IMPORTS
 # =====================
 import argparse
+import cProfile
+import mmap
 import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache, partial
+from time import perf_counter
 from bitarray import bitarray
 from math import floor, sin
 
+from .stats import DigestStats
+
+# =====================
+# CONSTANTS
+# =====================
+
+# "K[i] denotes a 32-bit constant, different for each (of 64) operation" - wiki
+# "pseudo-random numbers that will be mashed with the message in various
+# byzantine ways in the compression function... numbers like these typical for
+# hashing functions... have some desirable pseudo-random like properties
+# and have a compact description
+# note: verified that K vals are correct. Little endian bitstrings also correct.
+# Binary integer part of the sines of integers (units radians) as constants:
+K_SINES = tuple(floor(abs(sin(i + 1)) * 2**32) for i in range(0, 64))  # denoted "K" in refs
+
+# Same values as little endian bitarrays ("reference" engine). Bitstring reversed: bit 0 first
+K_SINES_BITS = tuple(bitarray('{0:032b}'.format(val)[::-1], endian='little') for val in K_SINES)
+
+# "Each round has a repeated seq. of 4 shift amounts... execute over 16-word block"
+# Constant shift amounts (optimized empirically, see md5 specification)
+SHIFTS = (
+    (7, 12, 17, 22),  # round 1
+    (5, 9, 14, 20),  # round 2
+    (4, 11, 16, 23),  # etc...
+    (6, 10, 15, 21),
+)  # denoted "S" in spec/refs
+
+# Flat per-step schedules: shift amount, and index "g" of the message word M[g] for each step
+STEP_SHIFTS = tuple(SHIFTS[i // 16][i % 4] for i in range(0, 64))
+STEP_WORD_INDS = tuple(
+    [i for i in range(0, 16)] +  # round 1
+    [(5*i + 1) % 16 for i in range(16, 32)] +  # round 2
+    [(3*i + 5) % 16 for i in range(32, 48)] +  # round 3
+    [(7*i) % 16 for i in range(48, 64)]  # round 4
+)
+
+# Nonlinear fcn "F" of each round, as source for the unrolled steps ({b}, {c}, {d} are words)
+ROUND_FCNS = (
+    '({b} & {c}) | (~{b} & {d})',
+    '({b} & {d}) | (~{d} & {c})',
+    '{b} ^ {c} ^ {d}',
+    '{c} ^ ({b} | (~{d} & 0xffffffff))',
+)
+
+
+def unrolled_steps (first, last):
+    """ Source lines for steps first..last-1, words held in locals a, b, c, d and the
+    message words in locals m0..m15.
+
+    Rather than "jumbling" A, B, C, D after each step, the names rotate: step i
+    updates the word that plays "A" in that step, so the next step's A is the
+    current D, etc. After every 4 steps the names are back in place.
+    """
+    words = 'abcd'
+    lines = []
+    for i in range(first, last):
+        # names of the words playing A, B, C, D at step i
+        a, b, c, d = (words[(j - i) % 4] for j in range(0, 4))
+        fcn = ROUND_FCNS[i // 16].format(b=b, c=c, d=d)
+        shift = STEP_SHIFTS[i]
+        # "F + A + K[i] + M[g]", leftrotate, then add B
+        lines.append(f'    f = ({fcn}) + {a} + {K_SINES[i]:#010x} + m{STEP_WORD_INDS[i]} & 0xffffffff')
+        lines.append(f'    {a} = {b} + ((f << {shift} | f >> {32 - shift}) & 0xffffffff) & 0xffffffff')
+    return lines
+
+
+def compile_fcn (name, lines):
+    namespace = {}
+    exec(compile('\n'.join(lines), f'<md5 {name}>', 'exec'), namespace)
+    return namespace[name]
+
+
+UNPACK_WORDS_LINE = '    ' + ', '.join(f'm{j}' for j in range(0, 16)) + ' = m_32bit_words'
+
+
+@lru_cache(maxsize=None)
+def build_unrolled_compress ():
+    """ Generate (once, then cached) the "fast" engine compression fcn:
+    compress(state, m_32bit_words) -> state, with all 64 steps written out and
+    K, g and shift amounts inlined as literals. No loop, branch or table lookup.
+    """
+    lines = [
+        'def compress_unrolled (state, m_32bit_words):',
+        '    a0, b0, c0, d0 = state',
+        '    a, b, c, d = state',
+        UNPACK_WORDS_LINE,
+    ]
+    lines += unrolled_steps(0, 64)
+    lines.append(
+        '    return (a0 + a & 0xffffffff, b0 + b & 0xffffffff, c0 + c & 0xffffffff, d0 + d & 0xffffffff)'
+    )
+    return compile_fcn('compress_unrolled', lines)
+
+
+@lru_cache(maxsize=None)
+def build_unrolled_rounds ():
+    """ Same steps as build_unrolled_compress, split into one fcn per round
+    (a, b, c, d, m_32bit_words) -> (a, b, c, d), so each round can be timed (see DigestStats).
+    Feed-forward of the state is left to the caller.
+    """
+    rounds = []
+    for r in range(0, 4):
+        lines = [f'def round_{r + 1} (a, b, c, d, m_32bit_words):', UNPACK_WORDS_LINE]
+        lines += unrolled_steps(16 * r, 16 * (r + 1))
+        lines.append('    return a, b, c, d')
+        rounds.append(compile_fcn(f'round_{r + 1}', lines))
+    return tuple(rounds)
+
 # =====================
 # CLASS DEF
 # =====================
 
 class Md5:
+    """ Incremental md5 hasher, usable in place of hashlib.md5:
+    update() consumes whole 64-byte blocks as data arrives and buffers only
+    the partial tail. digest()/hexdigest() pad a copy of the tail, so they
+    can be called any number of times and update() can continue afterwards.
+    """
+
+    ENGINES = ('fast', 'reference')
+
+    # hashlib compatible attributes
+    name = 'md5'
+    digest_size = 16
+    block_size = 64
+
+    # Initial values of 32-bit "words" A:D (see notes), also used as ints by "fast" engine
+    INIT_WORDS = (0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476)
+    MASK_32 = 0xffffffff
+
+    # A 512-bit block as sixteen 32-bit little endian words, unpacked in one go
+    BLOCK_WORDS = struct.Struct('<16I')
+
+    # Files are memory-mapped and compressed in windows of this many bytes.
+    # Files that can't be mapped are read through update() in chunks instead.
+    # NOTE: keep window size a multiple of the 64-byte block size, so no window has a tail to copy
+    FILE_WINDOW_SIZE = 2**24
+    FILE_CHUNK_SIZE = 2**20
+
+    # Number of prefix midstates kept by with_prefix(..., cache=True)
+    MIDSTATE_CACHE_SIZE = 32
+
+    def __init__(self, input=b'', engine='fast', stats=None):
+        """ Class constructor. input is bytes, a filepath or a string (see load_message_bytes).
+        stats is an optional DigestStats that collects per-phase counters and timing
+        (shared with copies of this hasher).
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"unknown engine '{engine}', choose from {self.ENGINES}")
+        self.engine = engine
+        self.stats = stats
+        if stats:
+            build_unrolled_rounds()  # one-time code generation, keep it out of the timings
+
+        # Running state: 32-bit words A:D as ints, count of bytes consumed so far
+        # and the partial (< 64 byte) block not yet compressed
+        self.state = self.INIT_WORDS
+        self.msg_len = 0
+        self.buffer = b''
+
+        if isinstance(input, str) and os.path.isfile(input):
+            self.update_file(input)  # mapped, never fully in memory
+        elif isinstance(input, str):
+            self.update(self.load_message_bytes(input))
+        else:
+            self.update(input)
 
-    def __init__(self, input):
-        """ Class constructor"""
-        # Bytes are converted to binary format and appended to bitarray
-        self.msg_bitarray = bitarray(endian='little')  # init little endian bitarray
-        self.msg_bitarray.frombytes(self.load_message_bytes(input))
-
-        # "K[i] denotes a 32-bit constant, different for each (of 64) operation" - wiki
-        # "pseudo-random numbers that will be mashed with the message in various
-        # byzantine ways in the compression function... numbers like these typical for
-        # hashing functions... have some desirable pseudo-random like properties
-        # and have a compact description
-        # note: verified that K vals are correct. Little endian bitstrings also correct.
-        # Binary integer part of the sines of integers (units radians) as constants:
-        self.K_SINES = []  # init empty list. denoted "K" in refs
-        for i in range(0, 64):
-            val = floor(abs(sin(i + 1)) * 2**32)
-            self.K_SINES.append(bitarray(self.num_to_lendian_bitstr(val, 32), endian='little'))
-
-        # "Each round has a repeated seq. of 4 shift amounts... execute over 16-word block"
-        # Init constant shift amounts (optimized empirically, see md5 specification)
-        self.SHIFTS = [
-            [7, 12, 17, 22],  # round 1
-            [5, 9, 14, 20],  # round 2
-            [4, 11, 16, 23],  # etc...
-            [6, 10, 15, 21],
-        ]  # denoted "S" in spec/refs
+    def update (self, data):
+        """ Feed more bytes to the hash. Works on a memoryview of data: whole 64-byte
+        blocks are compressed in place, only the partial tail (< 64 bytes) is copied.
+        """
+        if isinstance(data, str):
+            raise TypeError("Strings must be encoded before hashing")
+
+        with self.phase('load'), memoryview(data).cast('B') as view:  # byte view of any buffer
+            self.msg_len += len(view)
+            if self.stats:
+                self.stats.count('bytes', len(view))
+
+            # Complete a partially buffered block first (small copy)
+            offset = 0
+            if self.buffer:
+                offset = min(64 - len(self.buffer), len(view))
+                self.buffer += bytes(view[:offset])
+                if len(self.buffer) < 64:
+                    return
+                self.state = self.compress(self.state, self.buffer)
+                self.buffer = b''
+
+            full_end = len(view) - ((len(view) - offset) % 64)
+            if full_end > offset:
+                self.state = self.compress(self.state, view[offset: full_end])
+            self.buffer = bytes(view[full_end:])
+
+    def update_file (self, filepath):
+        """ Feed a file to the hash. The file is memory-mapped and whole blocks are
+        compressed straight from FILE_WINDOW_SIZE windows of the map (no copies), so
+        files larger than RAM can be hashed. Only the < 64 byte tail is buffered,
+        padding is built separately in digest().
+        """
+        with self.phase('load'), open(filepath, "rb") as f:  # read binary
+            if os.fstat(f.fileno()).st_size == 0:
+                # empty file, or pipe/device that can't be mapped: plain chunked reads
+                for chunk in iter(lambda: f.read(self.FILE_CHUNK_SIZE), b''):
+                    self.update(chunk)
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for offset in range(0, len(view), self.FILE_WINDOW_SIZE):
+                        self.update(view[offset: offset + self.FILE_WINDOW_SIZE])
+
+    def phase (self, name):
+        """ Context manager timing phase name into self.stats, no-op without stats"""
+        return self.stats.phase(name) if self.stats else nullcontext()
+
+    def copy (self):
+        """ Return a clone of the running hash"""
+        clone = Md5.__new__(Md5)
+        clone.__dict__.update(self.__dict__)
+        return clone
+
+    def export_midstate (self):
+        """ Snapshot of the running hash on a 64-byte boundary: ((A, B, C, D), bytes processed).
+        Feed it to from_midstate() to carry on from here without recompressing the prefix.
+        """
+        if self.buffer:
+            raise ValueError(f"midstate only available on a 64-byte boundary ({self.msg_len} bytes processed)")
+        return self.state, self.msg_len
+
+    @classmethod
+    def from_midstate (cls, midstate, engine='fast'):
+        """ New hasher that continues from an export_midstate() snapshot"""
+        state, msg_len = midstate
+        if msg_len % 64:
+            raise ValueError(f"midstate byte count must be a multiple of 64, got {msg_len}")
+        md5 = cls(engine=engine)
+        md5.state = tuple(state)
+        md5.msg_len = msg_len
+        return md5
+
+    @classmethod
+    def with_prefix (cls, prefix, engine='fast', cache=True):
+        """ New hasher that has consumed prefix. The whole blocks of the prefix are only
+        compressed once: their midstate is kept in a small LRU cache keyed by prefix.
+        """
+        prefix = bytes(prefix)
+        full_len = len(prefix) - (len(prefix) % 64)
+        if cache:
+            midstate = cached_prefix_midstate(prefix[:full_len])
+        else:
+            midstate = prefix_midstate(prefix[:full_len])
 
-        # Init 32-bit "words" that alg operates on/modifies. "A":"D" (see notes)
-        self.a0 = bitarray(self.num_to_lendian_bitstr(0x67452301, 32), endian='little')
-        self.b0 = bitarray(self.num_to_lendian_bitstr(0xefcdab89, 32), endian='little')
-        self.c0 = bitarray(self.num_to_lendian_bitstr(0x98badcfe, 32), endian='little')
-        self.d0 = bitarray(self.num_to_lendian_bitstr(0x10325476, 32), endian='little')
+        md5 = cls.from_midstate(midstate, engine=engine)
+        md5.update(prefix[full_len:])
+        return md5
 
     def digest (self):
-        """ Execute main md5 alg. Operates on 128-bit word to make final hash (digest)
+        """ Finish the hash of everything fed so far and return the 16 digest bytes.
+        Running state is left untouched.
+        """
+        # Padding done on bytes (multiple of 64 bytes == 512 bits), only on the tail
+        with self.phase('padding'):
+            tail = self.buffer + self.padding_bytes(self.msg_len)
+        a0, b0, c0, d0 = self.compress(self.state, tail)
+
+        with self.phase('finalize'):
+            if self.stats:
+                self.stats.count('digests')
+            return struct.pack('<4I', a0, b0, c0, d0)
+
+    def hexdigest (self):
+        """ digest() as a string of hex digits"""
+        return self.digest().hex()
+
+    def compress (self, state, blocks):
+        """ Compress whole 64-byte blocks (bytes or memoryview) into state with the selected engine"""
+        if self.stats:
+            self.stats.count('blocks', len(blocks) // 64)
+            with self.stats.phase('blocks'):
+                if self.engine == 'reference':
+                    return self.compress_reference(state, blocks)
+                return self.compress_timed_rounds(state, blocks)
+
+        if self.engine == 'reference':
+            return self.compress_reference(state, blocks)
+
+        # sixteen 32-bit little endian words M[j], 0 ≤ j ≤ 15, per block, read straight from blocks
+        compress_unrolled = build_unrolled_compress()
+        for m_32bit_words in self.BLOCK_WORDS.iter_unpack(blocks):
+            state = compress_unrolled(state, m_32bit_words)
+        return state
+
+    def compress_timed_rounds (self, state, blocks):
+        """ "fast" engine, one generated fcn per round, with each round timed into self.stats"""
+        rounds = build_unrolled_rounds()
+        mask = self.MASK_32
+        for m_32bit_words in self.BLOCK_WORDS.iter_unpack(blocks):
+            a, b, c, d = state
+            for round_phase, round_fcn in zip(DigestStats.ROUND_PHASES, rounds):
+                start = perf_counter()
+                a, b, c, d = round_fcn(a, b, c, d, m_32bit_words)
+                self.stats.add(round_phase, perf_counter() - start)
+            state = ((state[0] + a) & mask, (state[1] + b) & mask, (state[2] + c) & mask, (state[3] + d) & mask)
+        return state
+
+    def compress_reference (self, state, blocks):
+        """ "reference" engine, block by block on bitarrays"""
+        for blk_offset in range(0, len(blocks), 64):
+            state = self.compress_bitarray(state, blocks[blk_offset: blk_offset + 64])
+        return state
+
+    def compress_bitarray (self, state, block):
+        """ Run the 64 md5 steps for one 64-byte block on bitarrays. Operates on 128-bit
+        word to make the next state. state is (A, B, C, D) as ints, converted to/from bitarrays.
         """
-        # First perform required padding (multiple of 512):
-        self.msg_bitarray = self.perform_padding(self, self.msg_bitarray)  # update bitarray
-
-        # Process the message in successive 512-bit chunks:
-        for blk_offset in range(0, int(len(self.msg_bitarray)), 512):  # step 512
-            # Get current block of 512-bits:
-            blk_512_bits = self.msg_bitarray[blk_offset: blk_offset + 512]
-
-            # Now break 512-bit block into sixteen 32-bit words M[j], 0 ≤ j ≤ 15
-            m_32bit_words = []  # (re-)init empty. "M" in references
-            for i in range(0, 512, 32):
-                m_32bit_words.append(blk_512_bits[i: i+16])
-
-            # Init hash values (128-bit broken up into 4 chunks) for block:
-            a_hash = self.a0  # denoted "A" in spec
-            b_hash = self.b0  # denoted "B" in spec
-            c_hash = self.c0  # etc...
-            d_hash = self.d0
-
-            # "Main Loop" -- execute operations
-            # Note to self: "^" is bitwise XOR, "|" is bitwise OR, "&" is bitwise AND, "~" is NOT
-            for i in range(0, 64):
-                # "fcn" is one of 4 possible nonlinear fcns. denoted "F" in refs
-
-                # Round 1 nonlinear fcn
-                if 0 <= i <= 15:
-                    fcn = (b_hash & c_hash) | ((~b_hash) & d_hash)
-                    g = i
-                    shifts = self.SHIFTS[0]  # repeated seq. of shift amts for round
-                # Round 2 nonlinear fcn
-                elif 16 <= i <= 31:
-                    fcn = (b_hash & d_hash) | ( (~d_hash) & c_hash)
-                    g = (5*i + 1) % 16
-                    shifts = self.SHIFTS[1]  # repeated seq. of shift amts for round
-
-                # Round 3 nonlinear fcn
-                elif 32 <= i <= 47:
-                    fcn = b_hash ^ c_hash ^ d_hash
-                    g = (3*i + 5) % 16
-                    shifts = self.SHIFTS[2]  # repeated seq. of shift amts for round
-
-                elif 48 <= i <= 63:
-                    fcn = c_hash ^ (b_hash | (~d_hash))
-                    g = (7*i) % 16
-                    shifts = self.SHIFTS[3]  # repeated seq. of shift amts for round
-                # end if
-
-                # Update nonlinear function value
-                # Note: modular addition is used in md5 alg
-                fcn = self.modular_add(fcn, a_hash, modulus=2**32, bits=32)  # "F + A"
-                fcn = self.modular_add(fcn, self.K_SINES[i], modulus=2**32, bits=32)  # "...+ K[i]"
-                fcn = self.modular_add(fcn, m_32bit_words[g], modulus=2**32, bits=32)  # "...+ M[g]"
-                fcn = self.circular_leftrotate(fcn, shifts[i % 4])  # mod four to repeat shift pattern
-
-                # "Jumble" the 32-bit words of the hash "A, B, C, D"
-                a_hash = d_hash
-                d_hash = c_hash
-                c_hash = b_hash
-                b_hash = self.modular_add(b_hash, fcn)
-
-            # end i in range(0, 64)
-            print(int.from_bytes(a_hash.tobytes(), 'little'))
-            print(int.from_bytes(b_hash.tobytes(), 'little'))
-            print(int.from_bytes(c_hash.tobytes(), 'little'))
-            print(int.from_bytes(d_hash.tobytes(), 'little'))
-
-            # Add this chunk's hash to result so far:
-            self.a0 = self.modular_add(self.a0, a_hash, 2**32, 32)
-            self.b0 = self.modular_add(self.b0, b_hash, 2**32, 32)
-            self.c0 = self.modular_add(self.c0, c_hash, 2**32, 32)
-            self.d0 = self.modular_add(self.d0, d_hash, 2**32, 32)
-
-        # end for blk_offset in range(...)
-        digest = self.a0 + self.b0 + self.c0 + self.d0
-        return self.bin_to_hex(digest)  # confirmed hex convert working correctly
+        # Bytes are converted to binary format: current block of 512-bits
+        blk_512_bits = bitarray(endian='little')  # init little endian bitarray
+        blk_512_bits.frombytes(bytes(block))
+
+        # Init 32-bit "words" that alg operates on/modifies. "A":"D" (see notes)
+        a0, b0, c0, d0 = [
+            bitarray(self.num_to_lendian_bitstr(word, 32), endian='little') for word in state
+        ]
+
+        # Now break 512-bit block into sixteen 32-bit words M[j], 0 ≤ j ≤ 15
+        m_32bit_words = []  # (re-)init empty. "M" in references
+        for i in range(0, 512, 32):
+            m_32bit_words.append(blk_512_bits[i: i+32])
+
+        # Init hash values (128-bit broken up into 4 chunks) for block:
+        a_hash = a0  # denoted "A" in spec
+        b_hash = b0  # denoted "B" in spec
+        c_hash = c0  # etc...
+        d_hash = d0
+
+        # "Main Loop" -- execute operations
+        # Note to self: "^" is bitwise XOR, "|" is bitwise OR, "&" is bitwise AND, "~" is NOT
+        for i in range(0, 64):
+            # "fcn" is one of 4 possible nonlinear fcns. denoted "F" in refs
+
+            # Round 1 nonlinear fcn
+            if 0 <= i <= 15:
+                fcn = (b_hash & c_hash) | ((~b_hash) & d_hash)
+                g = i
+                shifts = SHIFTS[0]  # repeated seq. of shift amts for round
+            # Round 2 nonlinear fcn
+            elif 16 <= i <= 31:
+                fcn = (b_hash & d_hash) | ( (~d_hash) & c_hash)
+                g = (5*i + 1) % 16
+                shifts = SHIFTS[1]  # repeated seq. of shift amts for round
+
+            # Round 3 nonlinear fcn
+            elif 32 <= i <= 47:
+                fcn = b_hash ^ c_hash ^ d_hash
+                g = (3*i + 5) % 16
+                shifts = SHIFTS[2]  # repeated seq. of shift amts for round
+
+            elif 48 <= i <= 63:
+                fcn = c_hash ^ (b_hash | (~d_hash))
+                g = (7*i) % 16
+                shifts = SHIFTS[3]  # repeated seq. of shift amts for round
+            # end if
+
+            # Update nonlinear function value
+            # Note: modular addition is used in md5 alg
+            fcn = self.modular_add(fcn, a_hash, modulus=2**32, bits=32)  # "F + A"
+            fcn = self.modular_add(fcn, K_SINES_BITS[i], modulus=2**32, bits=32)  # "...+ K[i]"
+            fcn = self.modular_add(fcn, m_32bit_words[g], modulus=2**32, bits=32)  # "...+ M[g]"
+            # mod four to repeat shift pattern. Bit 0 is least significant (little endian), so
+            # a leftrotate of the value is a rotate of the bitarray by (32 - shift) positions
+            fcn = self.circular_leftrotate(fcn, 32 - shifts[i % 4])
+
+            # "Jumble" the 32-bit words of the hash "A, B, C, D"
+            a_hash = d_hash
+            d_hash = c_hash
+            c_hash = b_hash
+            b_hash = self.modular_add(b_hash, fcn)
+
+        # end i in range(0, 64)
+
+        # Add this chunk's hash to result so far:
+        a0 = self.modular_add(a0, a_hash, 2**32, 32)
+        b0 = self.modular_add(b0, b_hash, 2**32, 32)
+        c0 = self.modular_add(c0, c_hash, 2**32, 32)
+        d0 = self.modular_add(d0, d_hash, 2**32, 32)
+
+        return tuple(int.from_bytes(word.tobytes(), 'little') for word in (a0, b0, c0, d0))
 
     @staticmethod
     def load_message_bytes (input):
-        """ Takes file or string as input - note that utf-8 chars are big endian"""
+        """ Takes file or string as input - note that utf-8 chars are big endian.
+        Reads a whole file into memory, Md5() itself maps files instead (see update_file)
+        """
 
         if os.path.isfile(input):
             with open(input, "rb") as f:  # read binary
@@ -162,24 +450,22 @@ class Md5:
 
     @staticmethod
     def perform_padding (self, msg_bitarray):
-        """ Perform required padding to message """
-
-        # Record length
-        msg_len = len(msg_bitarray) % 2**64
-
-        # First add a "1" bit to message:
-        msg_bitarray.append(1)
-
-        # append "0" bit until msg len in bits ≡ 448 (mod 512)
-        while (len(msg_bitarray) % 512) != 448:
-            msg_bitarray.append(0)
-
-        # Append original length in bits (mod 2**64) to msg
-        for bit in self.num_to_lendian_bitstr(msg_len, 64):
-            msg_bitarray.append(int(bit))
-
+        """ Perform required padding to message (a whole number of bytes). A "1" bit, "0"
+        bits until msg len in bits ≡ 448 (mod 512), then the original length in bits
+        (mod 2**64). Appended in one go as bytes, see padding_bytes()
+        """
+        msg_bitarray.frombytes(self.padding_bytes(len(msg_bitarray) // 8))
         return msg_bitarray
 
+    @staticmethod
+    def padding_bytes (msg_len):
+        """ Padding bytes to append to a message of msg_len bytes: 0x80 (the "1" bit is the
+        most significant bit of the byte), zeros until len ≡ 56 (mod 64), then length in
+        bits (mod 2**64) as little endian 64-bit int. Only the 1-2 tail blocks are built.
+        """
+        bit_len = (8 * msg_len) % 2**64
+        return b'\x80' + b'\x00' * ((55 - msg_len) % 64) + struct.pack('<Q', bit_len)
+
     @staticmethod
     def num_to_lendian_bitstr(integer, bits):
         integer = integer % 2**bits
@@ -241,13 +527,97 @@ class Md5:
         }
         digest = digest.tolist()  # convert bit array to list
 
-        # Break into 4-bit chunks for hex values
+        # Bits are little endian within each byte: reverse each byte, then
+        # break into 4-bit chunks for hex values
         hex_hash = ''
-        for i in range(0, 128, 4):
-            hex_hash += HEX_MAP[''.join(str(x) for x in digest[i:(i+4)])]
+        for i in range(0, 128, 8):
+            byte_bits = ''.join(str(x) for x in digest[i:(i+8)][::-1])
+            hex_hash += HEX_MAP[byte_bits[:4]] + HEX_MAP[byte_bits[4:]]
 
         return hex_hash
 
+# =====================
+# MIDSTATE CACHE
+# =====================
+
+def prefix_midstate (prefix):
+    """ Midstate after compressing prefix, which must be whole 64-byte blocks"""
+    return Md5(prefix).export_midstate()
+
+
+cached_prefix_midstate = lru_cache(maxsize=Md5.MIDSTATE_CACHE_SIZE)(prefix_midstate)
+
+# =====================
+# MULTI-FILE ("md5sum" mode)
+# =====================
+
+def iter_file_paths (paths):
+    """ Yield paths in order, recursing (sorted) into any directories"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()  # walk in a stable order
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def hash_file (filepath, engine='fast'):
+    """ Hash one file. Returns (hexdigest, None) or (None, error message), so a
+    bad path doesn't stop the other files (runs in pool worker processes)
+    """
+    try:
+        md5 = Md5(engine=engine)
+        md5.update_file(filepath)
+    except OSError as err:
+        return None, err.strerror
+    return md5.hexdigest(), None
+
+
+def sum_files (paths, engine='fast', jobs=None):
+    """ Hash files (directories are recursed into) across a process pool of
+    jobs workers (default: number of cores). Yields (path, hexdigest, error)
+    in input order as results come back.
+    """
+    file_paths = iter_file_paths(paths)
+    worker = partial(hash_file, engine=engine)
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        for path in file_paths:
+            yield (path,) + worker(path)
+        return
+
+    file_paths = list(file_paths)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # map keeps input order; chunks keep IPC overhead down for many small files
+        chunksize = max(1, min(64, len(file_paths) // (4 * jobs)))
+        for path, result in zip(file_paths, executor.map(worker, file_paths, chunksize=chunksize)):
+            yield (path,) + result
+
+
+def format_sum_line (hexdigest, path):
+    """ md5sum output format. As md5sum does, names with a backslash or newline
+    are escaped and the line is prefixed with a backslash
+    """
+    if '\\' in path or '\n' in path:
+        path = path.replace('\\', '\\\\').replace('\n', '\\n')
+        return f"\\{hexdigest}  {path}"
+    return f"{hexdigest}  {path}"
+
+
+def print_sums (paths, engine='fast', jobs=None):
+    """ Print md5sum style lines, errors to stderr. Returns exit status"""
+    status = 0
+    for path, hexdigest, error in sum_files(paths, engine=engine, jobs=jobs):
+        if error:
+            print(f"md5: {path}: {error}", file=sys.stderr)
+            status = 1
+        else:
+            print(format_sum_line(hexdigest, path), flush=True)
+    return status
+
 # =====================
 # HELPER
 # =====================
@@ -256,14 +626,43 @@ def handle_arguments ():
     """ """
     parser = argparse.ArgumentParser(
         description="Generates m5d hash for a string or file. Only supports standard 8-bit characters",
-        usage="python %(prog)s <string | filepath>"
+        usage="python %(prog)s <string | filepath> | --sum <path> [<path> ...] | "
+              "--manifest <index> <path> [<path> ...] | --check <index> | "
+              "--chunked <chunk manifest> <filepath> | --verify-chunks <chunk manifest>"
     )
 
-    parser.add_argument('input', nargs="+", type=str)  # required
+    parser.add_argument('input', nargs="*", type=str)  # required, except for --check
+    parser.add_argument('--engine', choices=Md5.ENGINES, default='fast',
+                        help="compression engine (default: fast)")
+    parser.add_argument('-s', '--sum', action='store_true',
+                        help="md5sum mode: hash every file given, recursing into directories")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes for --sum/--manifest/--check (default: number of cores)")
+    parser.add_argument('-m', '--manifest', metavar='INDEX',
+                        help="create/update a manifest of the files under the paths given, "
+                             "only re-hashing files whose size/mtime/inode changed")
+    parser.add_argument('-c', '--check', metavar='INDEX',
+                        help="re-hash every file in a manifest and report OK/FAILED (like md5sum -c)")
+
+    parser.add_argument('--chunked', metavar='CHUNK_MANIFEST',
+                        help="hash a large file in parallel chunks, recording chunk digests and a "
+                             "digest-of-digests in CHUNK_MANIFEST. Re-running resumes missing chunks")
+    parser.add_argument('--chunk-size', type=int, default=64 * 2**20,
+                        help="bytes per chunk for --chunked (default: 64 MB)")
+    parser.add_argument('--verify-chunks', metavar='CHUNK_MANIFEST',
+                        help="re-hash the chunks of a --chunked manifest and report OK/FAILED per chunk")
+    parser.add_argument('--chunks', type=int, nargs='+', default=None,
+                        help="chunk indexes for --verify-chunks (default: all)")
+    parser.add_argument('--profile', action='store_true',
+                        help="print per-phase counters and timing to stderr (single input only)")
+    parser.add_argument('--cprofile', metavar='FILE',
+                        help="run under cProfile and dump the stats to FILE (see pstats)")
 
     args = parser.parse_args()
+    if not args.input and not (args.check or args.verify_chunks):
+        parser.error("the following arguments are required: input")
 
-    return args.input[0]
+    return args
 
 
 # =====================
@@ -271,9 +670,45 @@ def handle_arguments ():
 # =====================
 
 
+def run (args):
+    """ Run the mode selected by args. Returns exit status"""
+    if args.check or args.manifest:
+        from .manifest import print_check, print_update  # manifest imports this module
+
+        if args.check:
+            return print_check(args.check, engine=args.engine, jobs=args.jobs)
+        return print_update(args.manifest, args.input, engine=args.engine, jobs=args.jobs)
+    if args.chunked or args.verify_chunks:
+        from .chunked import print_chunked, print_verify  # chunked imports this module
+
+        if args.verify_chunks:
+            return print_verify(args.verify_chunks, args.chunks, engine=args.engine, jobs=args.jobs)
+        return print_chunked(args.input[0], args.chunked, chunk_size=args.chunk_size,
+                             engine=args.engine, jobs=args.jobs)
+    if args.sum:
+        return print_sums(args.input, engine=args.engine, jobs=args.jobs)
+
+    stats = DigestStats() if args.profile else None
+    md5 = Md5(args.input[0], engine=args.engine, stats=stats)
+    print(md5.hexdigest())
+    if stats:
+        print(stats.report(), file=sys.stderr)  # keep stdout clean for piping
+    return 0
+
+
 def main ():
-    md5 = Md5(handle_arguments())
-    print(md5.digest())
+    args = handle_arguments()
+    if not args.cprofile:
+        sys.exit(run(args))
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        status = run(args)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+    sys.exit(status)
 
 # =====================
 # ENTRY POINT
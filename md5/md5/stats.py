@@ -0,0 +1,79 @@
+""" Per-phase counters and timing for Md5
+
+    Pass a DigestStats to Md5(..., stats=stats) to see where the time goes. Times are
+    exclusive: a phase running inside another (e.g. block compression inside loading)
+    is only counted once, in the inner phase, so the phases add up to the total.
+
+    Phases:
+    load -- update()/update_file(): buffering, mapping and reading input
+    padding -- building the padded tail block(s) in digest()
+    blocks -- block iteration: unpacking words, feed-forward of A:D
+    round 1..4 -- the 16 steps of each round ("fast" engine only, the "reference"
+                  engine reports all of its step time under blocks)
+    finalize -- packing the digest
+"""
+
+# =====================
+# IMPORTS
+# =====================
+from contextlib import contextmanager
+from time import perf_counter
+
+# =====================
+# CLASS DEF
+# =====================
+
+
+class DigestStats:
+
+    ROUND_PHASES = ('round 1', 'round 2', 'round 3', 'round 4')
+    PHASES = ('load', 'padding', 'blocks') + ROUND_PHASES + ('finalize',)
+
+    def __init__(self):
+        """ Class constructor"""
+        self.seconds = dict.fromkeys(self.PHASES, 0.0)
+        self.counts = {'bytes': 0, 'blocks': 0, 'digests': 0}
+
+        # stack with the time spent in nested phases, one entry per open phase
+        self.child_seconds = []
+
+    @contextmanager
+    def phase (self, name):
+        """ Time the enclosed code as phase name (exclusive of nested phases)"""
+        self.child_seconds.append(0.0)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            self.add(name, elapsed - self.child_seconds.pop(), elapsed)
+
+    def add (self, name, seconds, elapsed=None):
+        """ Add exclusive seconds to phase name. elapsed (default: seconds) is
+        credited to the enclosing phase, so it isn't counted twice
+        """
+        self.seconds[name] += seconds
+        if self.child_seconds:
+            self.child_seconds[-1] += seconds if elapsed is None else elapsed
+
+    def count (self, name, n=1):
+        self.counts[name] += n
+
+    def total_seconds (self):
+        return sum(self.seconds.values())
+
+    def as_dict (self):
+        return {'seconds': dict(self.seconds), 'counts': dict(self.counts)}
+
+    def report (self):
+        """ Table of phase times and counters, as a string"""
+        total = self.total_seconds()
+        lines = [f"{'phase':<10} {'seconds':>12} {'%':>6}"]
+        for name in self.PHASES:
+            share = 100 * self.seconds[name] / total if total else 0.0
+            lines.append(f"{name:<10} {self.seconds[name]:12.6f} {share:6.1f}")
+        lines.append(f"{'total':<10} {total:12.6f}")
+
+        mb_per_s = self.counts['bytes'] / total / 1e6 if total else 0.0
+        lines.append(', '.join(f"{name}: {val}" for name, val in self.counts.items()) + f", MB/s: {mb_per_s:.3f}")
+        return '\n'.join(lines)
@@ -0,0 +1,156 @@
+""" Throughput benchmark for the md5 package vs. hashlib.md5
+
+    For each input size, every engine hashes the same message repeatedly for at least
+    --min-time seconds and reports MB/s and messages/s, plus its speed relative to
+    hashlib. Results are written as JSON so runs of different versions can be compared.
+
+    Run from this directory (after installing the package):
+    `python bench.py --output bench.json`
+"""
+
+# =====================
+# IMPORTS
+# =====================
+import argparse
+import hashlib
+import json
+import platform
+import time
+from md5 import md5
+from md5 import batch
+from md5._version import __version__
+
+# =====================
+# CASES
+# =====================
+
+# (name, message size in bytes). 55/56/64 bytes sit on the padding boundaries
+CASES = [
+    ('empty', 0),
+    ('55B', 55),
+    ('56B', 56),
+    ('64B', 64),
+    ('1KB', 2**10),
+    ('1MB', 2**20),
+    ('100MB', 100 * 2**20),
+]
+
+# Messages per call for the batch engine
+BATCH_LANES = 4096
+
+
+def hash_hashlib (msg):
+    return hashlib.md5(msg).digest()
+
+
+def hash_fast (msg):
+    return md5.Md5(msg, engine='fast').digest()
+
+
+def hash_reference (msg):
+    return md5.Md5(msg, engine='reference').digest()
+
+
+def hash_batch (msgs):
+    return batch.md5_batch(msgs)
+
+
+# name: (hash fcn, messages per call)
+ENGINES = {
+    'hashlib': (hash_hashlib, 1),
+    'fast': (hash_fast, 1),
+    'reference': (hash_reference, 1),
+    'batch': (hash_batch, BATCH_LANES),
+}
+
+# =====================
+# BENCHMARK
+# =====================
+
+
+def time_engine (hash_fcn, msg, msgs_per_call, min_time):
+    """ Call hash_fcn until min_time has passed (at least once). Returns (calls, seconds)"""
+    arg = [msg] * msgs_per_call if msgs_per_call > 1 else msg
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        hash_fcn(arg)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return calls, elapsed
+
+
+def run (cases, engines, min_time, max_sizes):
+    """ Benchmark every (case, engine). Engines with a max size skip larger cases"""
+    results = []
+    for case, size in cases:
+        msg = bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+        hashlib_rate = None
+
+        for engine in engines:
+            result = {'case': case, 'size': size, 'engine': engine}
+            if size > max_sizes.get(engine, size):
+                result['skipped'] = f"size above {max_sizes[engine]} bytes"
+                results.append(result)
+                continue
+
+            hash_fcn, msgs_per_call = ENGINES[engine]
+            calls, seconds = time_engine(hash_fcn, msg, msgs_per_call, min_time)
+            msgs = calls * msgs_per_call
+            result.update({
+                'messages': msgs,
+                'seconds': seconds,
+                'msgs_per_s': msgs / seconds,
+                'mb_per_s': msgs * size / seconds / 1e6,
+            })
+            if engine == 'hashlib':
+                hashlib_rate = result['msgs_per_s']
+            if hashlib_rate:
+                result['vs_hashlib'] = result['msgs_per_s'] / hashlib_rate
+
+            print(f"{case:>6} {engine:>10}: {result['mb_per_s']:12.3f} MB/s {result['msgs_per_s']:14.1f} msg/s")
+            results.append(result)
+
+    return results
+
+
+# =====================
+# MAIN
+# =====================
+
+
+def main ():
+    parser = argparse.ArgumentParser(description="md5 package throughput benchmark vs. hashlib.md5")
+    parser.add_argument('--output', default='bench.json', help="JSON results file (default: bench.json)")
+    parser.add_argument('--cases', nargs='+', choices=[case for case, _ in CASES], default=None,
+                        help="input sizes to run (default: all)")
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES),
+                        help="engines to run, hashlib is the baseline (default: all)")
+    parser.add_argument('--min-time', type=float, default=0.5, help="seconds per measurement (default: 0.5)")
+    parser.add_argument('--reference-max-size', type=int, default=2**10,
+                        help="skip larger inputs for the (very slow) reference engine (default: 1024)")
+    parser.add_argument('--batch-max-size', type=int, default=2**10,
+                        help="skip larger inputs for the batch engine (default: 1024)")
+    args = parser.parse_args()
+
+    cases = [(case, size) for case, size in CASES if not args.cases or case in args.cases]
+    engines = ['hashlib'] + [engine for engine in args.engines if engine != 'hashlib']
+    max_sizes = {'reference': args.reference_max_size, 'batch': args.batch_max_size}
+
+    results = run(cases, engines, args.min_time, max_sizes)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'version': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'min_time': args.min_time,
+            'results': results,
+        }, f, indent=2)
+    print(f"results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
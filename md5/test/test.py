@@ -1,31 +1,171 @@
+import array
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import os
+import tempfile
 import unittest
+from unittest import mock
 from md5 import md5
+from md5 import batch
+from md5 import manifest
+from md5 import hmac_md5
+from md5 import aio
+from md5 import backend
+from md5 import stats
+from md5 import chunked
 from bitarray import bitarray
 
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Strings around the padding boundaries (55/56 bytes fit/overflow the last block)
+VECTORS = ['', 'a', 'abc', 'message digest', 'x' * 55, 'x' * 56, 'x' * 64, 'x' * 200]
+
+
+@contextlib.contextmanager
+def record_packed_shapes ():
+    """ Yields a list that collects the (blocks, 16, lanes) shape of every array batch.pack_lanes builds"""
+    shapes = []
+    pack_lanes = batch.pack_lanes
+
+    def recording_pack_lanes (*args):
+        m_32bit_words, blk_counts = pack_lanes(*args)
+        shapes.append(m_32bit_words.shape)
+        return m_32bit_words, blk_counts
+
+    with mock.patch.object(batch, 'pack_lanes', recording_pack_lanes):
+        yield shapes
+
+
 class TestMd5(unittest.TestCase):
 
     def test_blank(self):
         test = md5.Md5("")
-        digest = test.digest()
+        digest = test.hexdigest()
         self.assertEqual('d41d8cd98f00b204e9800998ecf8427e', digest)
 
+    def test_fast_engine (self):
+        for msg in VECTORS:
+            self.assertEqual(hashlib.md5(msg.encode()).hexdigest(), md5.Md5(msg).hexdigest())
+
+    def test_reference_engine (self):
+        for msg in VECTORS:
+            digest = md5.Md5(msg, engine='reference').hexdigest()
+            self.assertEqual(md5.Md5(msg, engine='fast').hexdigest(), digest)
+
+    def test_update (self):
+        data = bytes(range(256)) * 5
+        for step in (1, 7, 63, 64, 65, 500):
+            test = md5.Md5()
+            for i in range(0, len(data), step):
+                test.update(data[i: i + step])
+            self.assertEqual(hashlib.md5(data).digest(), test.digest())
+
+    def test_update_buffers (self):
+        data = bytes(range(256)) * 3
+        for buffer in (bytearray(data), memoryview(data)[10:], array.array('I', data)):
+            test = md5.Md5(b'head')
+            test.update(buffer)
+            self.assertEqual(hashlib.md5(b'head' + bytes(memoryview(buffer).cast('B'))).digest(), test.digest())
+
+    def test_digest_keeps_state (self):
+        test = md5.Md5(b'abc')
+        self.assertEqual(test.digest(), test.digest())
+        test.update(b'def')
+        self.assertEqual(hashlib.md5(b'abcdef').hexdigest(), test.hexdigest())
+
+    def test_copy (self):
+        test = md5.Md5(b'x' * 100)
+        clone = test.copy()
+        clone.update(b'y')
+        self.assertEqual(hashlib.md5(b'x' * 100).digest(), test.digest())
+        self.assertEqual(hashlib.md5(b'x' * 100 + b'y').digest(), clone.digest())
+
+    def test_midstate (self):
+        test = md5.Md5(b'p' * 128)
+        midstate = test.export_midstate()
+        self.assertEqual(128, midstate[1])
+
+        resumed = md5.Md5.from_midstate(midstate)
+        resumed.update(b'suffix')
+        self.assertEqual(hashlib.md5(b'p' * 128 + b'suffix').digest(), resumed.digest())
+
+        with self.assertRaises(ValueError):
+            md5.Md5(b'p' * 100).export_midstate()  # not on a block boundary
+        with self.assertRaises(ValueError):
+            md5.Md5.from_midstate((md5.Md5.INIT_WORDS, 10))
+
+    def test_with_prefix (self):
+        md5.cached_prefix_midstate.cache_clear()
+        prefix = b'shared prefix ' * 20
+        for suffix in (b'', b'a', b'b' * 100):
+            for cache in (True, False):
+                test = md5.Md5.with_prefix(prefix, cache=cache)
+                test.update(suffix)
+                self.assertEqual(hashlib.md5(prefix + suffix).digest(), test.digest())
+        self.assertEqual(2, md5.cached_prefix_midstate.cache_info().hits)
+
+    def test_update_file (self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for size in (0, 1, 63, 64, 65, 1000, 4099):
+                data = bytes(range(256)) * (size // 256 + 1)
+                path = os.path.join(tmp_dir, f"{size}.bin")
+                with open(path, "wb") as f:
+                    f.write(data[:size])
+
+                self.assertEqual(hashlib.md5(data[:size]).digest(), md5.Md5(path).digest())
+
+                # small windows and a partially buffered block before the file
+                test = md5.Md5(b'abc')
+                test.FILE_WINDOW_SIZE = 128
+                test.update_file(path)
+                self.assertEqual(hashlib.md5(b'abc' + data[:size]).digest(), test.digest())
+
+    def test_sum_files (self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.mkdir(os.path.join(tmp_dir, "sub"))
+            contents = {"b.txt": b"b", "a.txt": b"a" * 100, os.path.join("sub", "c.txt"): b""}
+            for name, data in contents.items():
+                with open(os.path.join(tmp_dir, name), "wb") as f:
+                    f.write(data)
+
+            missing = os.path.join(tmp_dir, "missing")
+            expected = [
+                (os.path.join(tmp_dir, "a.txt"), hashlib.md5(b"a" * 100).hexdigest(), None),
+                (os.path.join(tmp_dir, "b.txt"), hashlib.md5(b"b").hexdigest(), None),
+                (os.path.join(tmp_dir, "sub", "c.txt"), hashlib.md5(b"").hexdigest(), None),
+                (missing, None, "No such file or directory"),
+            ]
+            for jobs in (1, 2):
+                self.assertEqual(expected, list(md5.sum_files([tmp_dir, missing], jobs=jobs)))
+
+    def test_format_sum_line (self):
+        self.assertEqual("abc  x.txt", md5.format_sum_line("abc", "x.txt"))
+        self.assertEqual("\\abc  a\\nb", md5.format_sum_line("abc", "a\nb"))
+
+    def test_update_str (self):
+        with self.assertRaises(TypeError):
+            md5.Md5().update('abc')
+
+    def test_unknown_engine (self):
+        with self.assertRaises(ValueError):
+            md5.Md5("", engine='nope')
+
     def test_load_file (self):
-        file = "blank.txt"
-        self.assertEqual(bitarray('0'), md5.Md5(file).load_message(file))
+        file = os.path.join(TEST_DIR, "blank.txt")
+        self.assertEqual(b'', md5.Md5.load_message_bytes(file))
 
     def test_padding (self):
-        file = "blank.txt"
+        file = os.path.join(TEST_DIR, "blank.txt")
+        msg_bitarray = bitarray(endian='little')
+        msg_bitarray.frombytes(md5.Md5.load_message_bytes(file))
         test = md5.Md5(file)
-        msg_bitarray = test.perform_padding(self, self.msg_bitarray)  # update bitarray
-        correct_bitstring = '10000000000000000000000000000000000000000000000000000000000000000000000000000000000000' \
-                            '00000000000000000000000000000000000000000000000000000000000000000000000000000000000000' \
-                            '00000000000000000000000000000000000000000000000000000000000000000000000000000000000000' \
-                            '00000000000000000000000000000000000000000000000000000000000000000000000000000000000000' \
-                            '00000000000000000000000000000000000000000000000000000000000000000000000000000000000000' \
-                            '0000000000000000000000000000000000000000000000000000000000000000000000000000000000'
+        msg_bitarray = test.perform_padding(test, msg_bitarray)  # update bitarray
+
+        # one block: 0x80 byte (the "1" bit is the high bit), then zeros (incl. zero length)
         correct = bitarray(endian='little')
-        for bit in correct_bitstring:
-            correct.append(int(bit))
+        correct.frombytes(b'\x80' + b'\x00' * 63)
 
         self.assertEqual(correct, msg_bitarray)  # little endian
 
@@ -55,5 +195,304 @@ class TestMd5(unittest.TestCase):
         self.assertEqual(bitarray_ou, test.circular_leftrotate(bitarray_in, shift_cnt=2))
 
 
+class TestDigestStats(unittest.TestCase):
+
+    def test_stats (self):
+        for engine in md5.Md5.ENGINES:
+            digest_stats = stats.DigestStats()
+            test = md5.Md5(b'x' * 1000, engine=engine, stats=digest_stats)
+            self.assertEqual(hashlib.md5(b'x' * 1000).digest(), test.digest())
+
+            self.assertEqual({'bytes': 1000, 'blocks': 16, 'digests': 1}, digest_stats.counts)
+            self.assertEqual(set(stats.DigestStats.PHASES), set(digest_stats.seconds))
+            self.assertGreater(digest_stats.seconds['blocks'], 0.0)
+            if engine == 'fast':
+                for round_phase in stats.DigestStats.ROUND_PHASES:
+                    self.assertGreater(digest_stats.seconds[round_phase], 0.0)
+            self.assertIn('round 4', digest_stats.report())
+
+    def test_nested_phases (self):
+        digest_stats = stats.DigestStats()
+        with digest_stats.phase('load'):
+            with digest_stats.phase('blocks'):
+                digest_stats.add('round 1', 1.0)
+        self.assertEqual(1.0, digest_stats.seconds['round 1'])
+        self.assertLess(digest_stats.seconds['blocks'], 1.0)  # round time not counted twice
+        self.assertLess(digest_stats.seconds['load'], 1.0)
+
+
+class TestMd5Batch(unittest.TestCase):
+
+    def test_batch (self):
+        # mixed lengths, so lanes finish after different block counts
+        messages = [msg.encode() for msg in VECTORS] + [bytes(range(i)) for i in range(0, 256, 3)]
+        expected = [hashlib.md5(msg).digest() for msg in messages]
+        self.assertEqual(expected, batch.md5_batch(messages))
+
+        # 3 block count groups, split into several NumPy passes
+        with mock.patch.object(batch, 'md5_lanes', wraps=batch.md5_lanes) as md5_lanes:
+            self.assertEqual(expected, batch.md5_batch(messages, lanes=batch.MIN_LANES))
+        self.assertGreaterEqual(md5_lanes.call_count, 4)
+        self.assertTrue(all(len(call.args[0]) == batch.MIN_LANES for call in md5_lanes.call_args_list))
+
+        # fewer lanes than MIN_LANES would never vectorize, raised to MIN_LANES
+        with mock.patch.object(batch, 'md5_lanes', wraps=batch.md5_lanes) as md5_lanes:
+            self.assertEqual(expected, batch.md5_batch(messages, lanes=5))
+        self.assertGreaterEqual(md5_lanes.call_count, 4)
+
+    def test_batch_mixed_lengths (self):
+        # one long message must not make the short lanes pad to its length
+        messages = [b'a'] * 50 + [b'x' * 100000] + [b'b' * 100] * 50
+        groups = batch.lane_groups(messages)
+        self.assertIn([50], groups)
+        self.assertEqual(list(range(len(messages))), sorted(i for group in groups for i in group))
+
+        with record_packed_shapes() as shapes:
+            digests = batch.md5_batch(messages)
+        self.assertEqual([hashlib.md5(msg).digest() for msg in messages], digests)
+        # the long message went to the scalar Md5, the short lanes only pad to 2 blocks
+        self.assertEqual([(1, 16, 50), (2, 16, 50)], sorted(shapes))
+
+    def test_batch_empty (self):
+        self.assertEqual([], batch.md5_batch([]))
+
+    def test_batch_str (self):
+        with self.assertRaises(TypeError):
+            batch.md5_batch(['abc'])
+
+
+class TestHmacMd5(unittest.TestCase):
+
+    KEYS = [b'', b'key', b'k' * 64, b'k' * 100]  # incl. keys that are hashed first
+    MESSAGES = [b'', b'The quick brown fox jumps over the lazy dog', b'm' * 200]
+
+    def test_hmac (self):
+        for key in self.KEYS:
+            for msg in self.MESSAGES:
+                expected = hmac.new(key, msg, 'md5').digest()
+                test = hmac_md5.HmacMd5(key, msg)
+                self.assertEqual(expected, test.digest())
+                self.assertEqual(expected, test.mac(msg))
+                self.assertTrue(test.verify(msg, expected.hex()))
+                self.assertFalse(test.verify(msg + b'x', expected))
+
+    def test_update_copy (self):
+        test = hmac_md5.HmacMd5(b'key', b'abc')
+        clone = test.copy()
+        clone.update(b'def')
+        self.assertEqual(hmac.new(b'key', b'abc', 'md5').digest(), test.digest())
+        self.assertEqual(hmac.new(b'key', b'abcdef', 'md5').digest(), clone.digest())
+
+    def test_verify_batch (self):
+        for key in self.KEYS:
+            test = hmac_md5.HmacMd5(key)
+            pairs = [(msg, hmac.new(key, msg, 'md5').digest()) for msg in self.MESSAGES]
+            pairs.append((b'forged', pairs[0][1].hex()))
+            self.assertEqual([True] * len(self.MESSAGES) + [False], test.verify_batch(pairs))
+
+    def test_verify_batch_large_body (self):
+        key = b'key'
+        messages = [b'{"event": %d}' % i for i in range(40)] + [b'x' * 100000]
+        pairs = [(msg, hmac.new(key, msg, 'md5').digest()) for msg in messages]
+
+        with record_packed_shapes() as shapes:
+            self.assertEqual([True] * len(messages), hmac_md5.HmacMd5(key).verify_batch(pairs))
+        # the small bodies only pad to their own length, not the large one's
+        self.assertEqual(1, max(blocks for blocks, _, _ in shapes))
+
+
+class TestAio(unittest.TestCase):
+
+    DATA = bytes(range(256)) * 40
+
+    @staticmethod
+    async def async_chunks (data, step):
+        for i in range(0, len(data), step):
+            yield data[i: i + step]
+
+    def test_hash_stream (self):
+        async def run ():
+            reader = asyncio.StreamReader()
+            reader.feed_data(self.DATA)
+            reader.feed_eof()
+            return await aio.hash_stream(reader, chunk_size=1000, offload_size=500)
+
+        self.assertEqual(hashlib.md5(self.DATA).digest(), asyncio.run(run()).digest())
+
+    def test_hash_streams (self):
+        messages = [self.DATA, b'', self.DATA[:100]]
+
+        async def run ():
+            streams = [self.async_chunks(msg, 333) for msg in messages]
+            return await aio.hash_streams(streams, chunk_size=333, max_in_flight=1)
+
+        digests = [md5.digest() for md5 in asyncio.run(run())]
+        self.assertEqual([hashlib.md5(msg).digest() for msg in messages], digests)
+
+    def test_stalled_stream (self):
+        # a stream waiting on the network must not hold the permit a ready stream needs
+        async def stalled_chunks ():
+            for _ in range(3):
+                await asyncio.sleep(0.2)
+                yield b'x' * 100
+
+        async def run ():
+            limiter = asyncio.Semaphore(1)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            stalled = asyncio.ensure_future(aio.hash_stream(stalled_chunks(), limiter=limiter))
+            await asyncio.sleep(0)  # let the stalled stream start waiting
+            ready = await aio.hash_stream(self.async_chunks(self.DATA[:500], 100), limiter=limiter)
+            ready_time = loop.time() - start
+            await stalled
+            return ready, ready_time
+
+        ready, ready_time = asyncio.run(run())
+        self.assertEqual(hashlib.md5(self.DATA[:500]).digest(), ready.digest())
+        self.assertLess(ready_time, 0.1)
+
+    @staticmethod
+    async def failing_chunks (data, step, fail_at):
+        for i in range(0, len(data), step):
+            if i >= fail_at:
+                raise ConnectionResetError("peer went away")
+            yield data[i: i + step]
+
+    def test_hash_stream_error_releases (self):
+        async def run ():
+            limiter = asyncio.Semaphore(2)
+            with self.assertRaises(ConnectionResetError):
+                await aio.hash_stream(self.failing_chunks(self.DATA, 333, 1000), limiter=limiter)
+            # both permits are back
+            await asyncio.wait_for(asyncio.gather(limiter.acquire(), limiter.acquire()), 1)
+
+        asyncio.run(run())
+
+    def test_hash_streams_error (self):
+        async def run ():
+            streams = [self.async_chunks(self.DATA, 333), self.failing_chunks(self.DATA, 333, 1000),
+                       self.async_chunks(self.DATA, 333)]
+            # one chunk in flight: a leaked permit would hang the other streams
+            return await asyncio.wait_for(aio.hash_streams(streams, chunk_size=333, max_in_flight=1), 10)
+
+        with self.assertRaises(ConnectionResetError):
+            asyncio.run(run())
+
+
+class TestBackend(unittest.TestCase):
+
+    def setUp (self):
+        backend.selected_backend = None
+
+    def tearDown (self):
+        backend.selected_backend = None
+
+    def test_auto (self):
+        self.assertEqual('hashlib', backend.get_backend())
+        self.assertEqual(hashlib.md5(b'abc').digest(), backend.new(b'abc').digest())
+
+    def test_fips_fallback (self):
+        # FIPS builds refuse md5 with a ValueError
+        with mock.patch.object(backend.hashlib, 'md5', side_effect=ValueError("disabled for FIPS")):
+            self.assertFalse(backend.self_test('hashlib'))
+            self.assertEqual('fast', backend.get_backend())
+            self.assertIsInstance(backend.new(), md5.Md5)
+
+    def test_str_rejected (self):
+        # every backend behaves like hashlib.md5: a str is neither a path nor text
+        for name in backend.CONSTRUCTORS:
+            backend.set_backend(name)
+            with self.assertRaises(TypeError):
+                backend.new('setup.py')
+            self.assertEqual(hashlib.md5(b'abc').digest(), backend.new(bytearray(b'abc')).digest())
+
+    def test_env_var (self):
+        with mock.patch.dict(os.environ, {backend.ENV_VAR: 'fast'}):
+            self.assertEqual('fast', backend.get_backend())
+
+    def test_set_backend (self):
+        self.assertEqual('fast', backend.set_backend('fast'))
+        with self.assertRaises(ValueError):
+            backend.set_backend('nope')
+        with mock.patch.object(backend.hashlib, 'md5', side_effect=ValueError("disabled for FIPS")):
+            with self.assertRaises(RuntimeError):
+                backend.set_backend('hashlib')
+
+
+class TestManifest(unittest.TestCase):
+
+    def test_update_and_check (self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = os.path.join(tmp_dir, "index.json")
+            paths = [os.path.join(tmp_dir, name) for name in ("a.txt", "b.txt")]
+            for path in paths:
+                with open(path, "wb") as f:
+                    f.write(path.encode())
+
+            files, hashed, errors = manifest.update_manifest(index_path, [tmp_dir], jobs=1)
+            self.assertEqual(sorted(paths), sorted(files))  # index itself not included
+            self.assertEqual(sorted(paths), sorted(hashed))
+            self.assertEqual(hashlib.md5(paths[0].encode()).hexdigest(), files[paths[0]]['digest'])
+
+            # unchanged stat -> nothing re-hashed
+            files, hashed, errors = manifest.update_manifest(index_path, [tmp_dir], jobs=1)
+            self.assertEqual([], hashed)
+
+            with open(paths[1], "ab") as f:
+                f.write(b"more")
+            files, hashed, errors = manifest.update_manifest(index_path, [tmp_dir], jobs=1)
+            self.assertEqual([paths[1]], hashed)
+            self.assertEqual([], errors)
+
+            self.assertEqual([(path, 'OK') for path in sorted(paths)],
+                             list(manifest.check_manifest(index_path, jobs=2)))
+
+            with open(paths[0], "ab") as f:
+                f.write(b"changed")
+            os.remove(paths[1])
+            self.assertEqual([(paths[0], 'FAILED'), (paths[1], 'FAILED open or read')],
+                             list(manifest.check_manifest(index_path, jobs=2)))
+
+
+class TestChunked(unittest.TestCase):
+
+    def test_chunked_digest (self):
+        data = bytes(range(256)) * 40  # 10240 bytes -> 5 chunks of 2048
+        chunk_digests = [hashlib.md5(data[i: i + 2048]).digest() for i in range(0, len(data), 2048)]
+        expected = hashlib.md5(b''.join(chunk_digests)).hexdigest() + '-5'
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, "data.bin")
+            manifest_path = os.path.join(tmp_dir, "data.json")
+            with open(filepath, "wb") as f:
+                f.write(data)
+
+            manifest = chunked.chunked_digest(filepath, manifest_path, chunk_size=2048, jobs=2)
+            self.assertEqual([digest.hex() for digest in chunk_digests], manifest['chunks'])
+            self.assertEqual(expected, manifest['digest'])
+
+            # resume: only the missing chunk is hashed, recorded ones are kept as they are
+            manifest['chunks'][1] = None
+            manifest['chunks'][3] = '0' * 32
+            chunked.save_manifest(manifest_path, manifest)
+            manifest = chunked.chunked_digest(filepath, manifest_path, chunk_size=2048, jobs=2)
+            self.assertEqual(chunk_digests[1].hex(), manifest['chunks'][1])
+            self.assertEqual('0' * 32, manifest['chunks'][3])
+
+            self.assertEqual([(0, True), (3, False)], chunked.verify_chunks(manifest_path, [3, 0], jobs=2))
+
+            # indexes outside the manifest (negative ones too) are rejected before hashing
+            for indexes in ([0, 5], [-1]):
+                with self.assertRaises(ValueError):
+                    chunked.verify_chunks(manifest_path, indexes, jobs=1)
+
+    def test_empty_file (self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, "empty.bin")
+            open(filepath, "wb").close()
+            manifest = chunked.chunked_digest(filepath, filepath + ".json", chunk_size=2048, jobs=1)
+            self.assertEqual([hashlib.md5(b'').hexdigest()], manifest['chunks'])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file